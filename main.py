@@ -1,15 +1,17 @@
-from ursina import *
-from src.player import Player
-from src.game import Game
-from src.controller import KeyboardController, PS4Controller
-from src.enums import EntityType
+from src.misc.startup import startup  # First, it takes the launch time
+with startup.phase('import ursina'):
+    from ursina import *
+with startup.phase('import game modules'):
+    from src.player import Player
+    from src.game import Game
+    from src.enums import EntityType
 
 
-app = Ursina()
+with startup.phase('Ursina()'):
+    app = Ursina(**startup.app_options())
 
-game = Game()
-controller = PS4Controller()
-keyboard = KeyboardController()
+with startup.phase('Game()'):
+    game = Game()
 
 # Mode toggle
 is_edit_mode = False
@@ -68,4 +70,5 @@ def input(key):
         print("Edit mode:", is_edit_mode)
 
 
+startup.watch_first_frame()
 app.run()
@@ -1,14 +1,38 @@
-from src.character import *
-from src.controller import PS4Controller, KeyboardController, BaseController
-from src.enums import CollisionEffect, EntityType, DropEffect
-from src.game import Game
-from src.game_save import SaveManager
-from src.levels import load_npcs, get_levels_count
-from src.npc import EnemyTank, NpcSpawner
-from src.player import Player
-from src.settings import Settings
-from src.startmenu import StartMenu
-from src.tank import Tank
-from src.tileloader import TileLoader
-from src.ammunition import AmmoCatalog
-from src.iq import *
+"""
+The game package. The names below are imported on first access, so importing one module of the package, e.g.
+src.misc.startup from main.py, doesn't import the whole game with ursina and pygame.
+"""
+import importlib
+
+_EXPORTS = {
+    'PS4Controller': 'src.controller',
+    'KeyboardController': 'src.controller',
+    'BaseController': 'src.controller',
+    'CollisionEffect': 'src.enums',
+    'EntityType': 'src.enums',
+    'DropEffect': 'src.enums',
+    'Game': 'src.game',
+    'SaveManager': 'src.game_save',
+    'load_npcs': 'src.levels',
+    'get_levels_count': 'src.levels',
+    'EnemyTank': 'src.npc',
+    'NpcSpawner': 'src.npc',
+    'Player': 'src.player',
+    'Settings': 'src.settings',
+    'StartMenu': 'src.startmenu',
+    'Tank': 'src.tank',
+    'TileLoader': 'src.tileloader',
+    'AmmoCatalog': 'src.ammunition',
+}
+_STAR_MODULES = ('src.character', 'src.iq')  # Re-exported with *
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    if not name.startswith('_'):
+        for module_name in _STAR_MODULES:
+            module = importlib.import_module(module_name)
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError(f"module 'src' has no attribute '{name}'")
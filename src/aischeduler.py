@@ -0,0 +1,124 @@
+import time as pytime
+from src.enums import EntityType
+from src.registry import NPC_TYPES
+
+# Ticks between two thinks of an NPC by its level of detail
+THINK_INTERVALS = {
+    'engaged': 1,   # Locked on a player
+    'near': 2,      # A player is within the NPC's vision distance
+    'far': 6,       # Nobody around, the NPC only wanders
+}
+
+
+class AIScheduler:
+    """
+    Spreads the NPC think steps (NPCIntelligence.get_direction) over the simulation ticks under a time budget.
+    Every NPC has a think interval by its level of detail, the due NPCs think in the order of how late they are
+    until the budget of the tick is used up, the rest waits for the next tick. At least one NPC thinks every tick.
+    Between the thinks the tanks keep driving in the last decided direction.
+    """
+    def __init__(self, game, budget_ms=2, intervals=None):
+        self.game = game
+        self.budget = budget_ms / 1000
+        self.intervals = dict(THINK_INTERVALS, **(intervals or {}))
+        self.tick_index = 0
+        self.last_thinks = {}  # id(npc) -> tick index of its last think
+        self.thinks = 0        # Thinks in the last tick
+        self.deferred = 0      # Due NPCs left for the next tick because the budget ran out
+        self.time_spent = 0    # Seconds spent thinking in the last tick
+        self.total_thinks = 0
+        self.total_deferred = 0
+        self.total_time_spent = 0
+        self.ticks = 0
+        self.lod_counts = {lod: 0 for lod in self.intervals}
+
+    def level_of_detail(self, npc, players):
+        iq = npc.npc_iq
+        if iq.locked_on_player:
+            return 'engaged'
+        distance = iq.iq_config.distance
+        for player in players:
+            if abs(player.x - npc.x) <= distance and abs(player.y - npc.y) <= distance:
+                return 'near'
+        return 'far'
+
+    def tick(self, dt):
+        self.tick_index += 1
+        registry = self.game.registry
+        npcs = [npc for npc in registry.live_tanks(*NPC_TYPES) if npc.enabled and hasattr(npc, 'npc_iq')]
+        players = registry.live_tanks(EntityType.PLAYER_TANK)
+        alive = {id(npc) for npc in npcs}
+        for key in [key for key in self.last_thinks if key not in alive]:
+            del self.last_thinks[key]
+
+        due = []
+        lod_counts = {lod: 0 for lod in self.intervals}
+        for npc in npcs:
+            lod = self.level_of_detail(npc, players)
+            lod_counts[lod] += 1
+            last_think = self.last_thinks.get(id(npc))
+            if last_think is None:
+                due.append((float('inf'), npc, dt))  # Never thought yet
+                continue
+            waited = self.tick_index - last_think
+            if waited >= self.intervals[lod]:
+                due.append((waited - self.intervals[lod], npc, waited * dt))
+        due.sort(key=lambda item: item[0], reverse=True)
+
+        start = pytime.perf_counter()
+        thinks = 0
+        for _, npc, elapsed in due:
+            if thinks and pytime.perf_counter() - start >= self.budget:
+                break
+            npc.think(elapsed)
+            self.last_thinks[id(npc)] = self.tick_index
+            thinks += 1
+
+        self.time_spent = pytime.perf_counter() - start
+        self.thinks = thinks
+        self.deferred = len(due) - thinks
+        self.lod_counts = lod_counts
+        self.total_thinks += thinks
+        self.total_deferred += self.deferred
+        self.total_time_spent += self.time_spent
+        self.ticks += 1
+
+    def stats(self):
+        """Think counts and time spent, for the last tick and averaged over all the ticks"""
+        ticks = max(1, self.ticks)
+        return {
+            'thinks': self.thinks,
+            'deferred': self.deferred,
+            'time_ms': self.time_spent * 1000,
+            'average_thinks': self.total_thinks / ticks,
+            'average_time_ms': self.total_time_spent / ticks * 1000,
+            'total_deferred': self.total_deferred,
+            'levels_of_detail': dict(self.lod_counts),
+        }
+
+    def reset_stats(self):
+        self.total_thinks = self.total_deferred = self.total_time_spent = self.ticks = 0
+
+
+if __name__ == '__main__':
+    # 50 NPCs with a 0.2 ms think step under the 2 ms budget: without the scheduler a tick would cost 10 ms
+    import random
+    from types import SimpleNamespace
+    from src.registry import EntityRegistry
+
+    class Npc(SimpleNamespace):
+        def think(self, elapsed):
+            end = pytime.perf_counter() + 0.0002
+            while pytime.perf_counter() < end:
+                pass
+
+    game = SimpleNamespace(registry=EntityRegistry())
+    game.registry.add(SimpleNamespace(x=0, y=-6, entity_type=EntityType.PLAYER_TANK, is_exploded=False, enabled=True))
+    for i in range(50):
+        iq = SimpleNamespace(locked_on_player=i < 5, iq_config=SimpleNamespace(distance=5))
+        game.registry.add(Npc(x=random.uniform(-9, 9), y=random.uniform(-6, 6), entity_type=EntityType.ENEMY_TANK,
+                              is_exploded=False, enabled=True, npc_iq=iq))
+    scheduler = AIScheduler(game, budget_ms=2)
+    for _ in range(600):
+        scheduler.tick(1 / 60)
+    print(scheduler.stats())
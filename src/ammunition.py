@@ -3,7 +3,9 @@ from src.widgetry.effects import BulletEffect
 from src.enums import EntityType, CollisionEffect
 from src.misc.timer import Timer
 from src.misc.spranimator import SpriteAnimator
-from PIL import Image
+from src.misc.texturecache import texture_cache
+from src.misc.atlas import use_atlas_image
+from src.misc.audiopool import audio_voices, PRIORITY_HIGH
 from typing import List
 from abc import ABC, abstractmethod
 
@@ -11,7 +13,6 @@ class Landmine(Entity):
     def __init__(self, owner:Entity, explosion_animation : SpriteAnimator, **kwargs):
         super().__init__(
             model='quad', 
-            texture='assets/images/landmine.png',            
             collider='box',            
             color=color.white, 
             scale=(0.3, 0.3), 
@@ -19,9 +20,7 @@ class Landmine(Entity):
             **kwargs
             )
         
-        self.deploy_sound = Audio('assets/audio/landmine_drop.ogg', parent=self, autoplay=False, volume=1.0)
-        self.activation_sound = Audio('assets/audio/landmine_activation.ogg', parent=self,autoplay=False, volume=0.2)
-        self.explosion_sound = Audio('assets/audio/landmine_explosion.ogg', parent=self, autoplay=False, volume=1.0)
+        use_atlas_image(self, 'assets/images/landmine.png')
         self.effect_strength=50
         self.entity_type=EntityType.LANDMINE
         self.collision_effect=CollisionEffect.NO_EFFECT
@@ -30,27 +29,27 @@ class Landmine(Entity):
         self.activation_timer = Timer(3, 1, lambda _: None, self.activate)
         self.position = owner.position
         self.exploding = False
-        self.deploy_sound.play()
+        audio_voices.play('assets/audio/landmine_drop.ogg')
     
     def activate(self):
         def _activate():
-            self.activation_sound.play()
+            audio_voices.play('assets/audio/landmine_activation.ogg', volume=0.2)
             self.collision_effect = CollisionEffect.DAMAGE_EXPLOSION
             self.color = color.red
             print("landmine activated")
         self.activation_timer.end_callback = _activate
         self.activation_timer.start()
 
-    def update(self):
-        self.activation_timer.update()
+    def tick(self, dt):
+        self.activation_timer.update(dt)
         if self.exploding:
-            self.explosion_animation.update()
+            self.explosion_animation.update(dt)
 
     def _destroy(self):
         destroy(self)
 
     def explode(self):
-        self.explosion_sound.play()
+        audio_voices.play('assets/audio/landmine_explosion.ogg', priority=PRIORITY_HIGH)
         self.explosion_animation.animate(self, self._destroy)
         self.exploding = True
         
@@ -63,7 +62,6 @@ class BuildingBlock(Entity):
                          model='quad',
                             entity_type=EntityType.TERRAIN,
                             z = 0,                    
-                            texture='assets/images/white_wall.png',
                             scale=(self.tile_size - 0.001, self.tile_size - 0.001),
                             position=(owner.x, owner.y),
                             collider='box',
@@ -75,6 +73,7 @@ class BuildingBlock(Entity):
                             render_queue=1,
                             color = color.Color(1,1,1,1),
                             **kwargs)
+        use_atlas_image(self, 'assets/images/white_wall.png')  # Batched with the level tiles of the same atlas page
 
 class Bullet(Entity):
     def __init__(self, **kwargs):
@@ -127,6 +126,7 @@ class BulletPool:
 
     def release_bullet(self, bullet):
         if bullet in self.active_bullets:
+            self.owner.game.projectiles.remove(bullet)
             self.active_bullets.remove(bullet)
             bullet.pool_origin.append(bullet) # append the bullet to it's original pool
             bullet.visible = False
@@ -142,6 +142,7 @@ class BulletPool:
 
         for bullet in self.active_bullets:
             print(f"Destroying active bullet: {bullet}")
+            self.owner.game.projectiles.remove(bullet)
             destroy(bullet)
         self.active_bullets.clear()
 
@@ -150,10 +151,7 @@ class BulletPool:
             destroy(self.bullet_prefab)
             self.bullet_prefab = None  # Clear reference
 
-        if self.shoot_sound:
-            print(f"Destroying sound: {self.shoot_sound}")
-            destroy(self.shoot_sound)
-            self.shoot_sound = None  # Clear reference
+        self.shoot_sound = None  # The voice pool is shared with the other tanks
 
         print(f"BulletPool destruction for {self.owner} complete.")
 
@@ -188,9 +186,12 @@ class Deployable(BaseDeployable):
             return
         self.items_count -= 1
         deployed_object = self.deploy_method()
-        self.owner.game.terrain_entities.append(deployed_object)
+        self.owner.game.add_terrain_entity(deployed_object)
         return deployed_object
 
+    def destroy(self):
+        pass
+
 class LandmineDeployer(Deployable):
     def __init__(self, owner:Entity, max_size:int):
         self.owner = owner  
@@ -207,6 +208,10 @@ class LandmineDeployer(Deployable):
         deployed_object:Landmine = super().deploy()
         deployed_object.activate()
 
+    def destroy(self):
+        # The landmines already deployed keep playing the clip, the registry only drops it once unused
+        self.landmine_explosion_animation.release()
+
 class BuildingBlockDeployer(Deployable):
     def __init__(self, owner:Entity, max_size:int):
         self.owner = owner
@@ -231,7 +236,7 @@ class BuildingBlockDeployer(Deployable):
         snapped_y = round(calculated_position.y / tile_size) * tile_size
         snapped_position = Vec3(snapped_x, snapped_y, calculated_position.z)
 
-        deployed_object.position = snapped_position
+        self.owner.game.relocate_terrain_entity(deployed_object, snapped_position)
 
 class Deployables:
     def __init__(self, owner:Entity):
@@ -269,23 +274,22 @@ class Deployables:
             for i in range(count):
                 self.deployables[name].add()
 
+    def destroy(self):
+        for deployable in self.deployables.values():
+            deployable.destroy()
+
 class AmmoCatalog:
     def __init__(self, owner:Entity):
         self.owner = owner
         self.game = owner.game
-        self.shoot_sound0 = Audio("assets/audio/shoot0.wav", autoplay=False, volume=1.0)
-        self.shoot_sound1 = Audio("assets/audio/shoot1.wav", autoplay=False, volume=1.0)
+        # Voice pools shared by all the tanks, only the players' shots are heard
+        self.shoot_sound0 = audio_voices.pool("assets/audio/shoot0.wav")
+        self.shoot_sound1 = audio_voices.pool("assets/audio/shoot1.wav")
         self.deploy_pool = Deployables(owner=owner)
 
-        texture_bullet0 = load_texture('assets/images/bullet0.png')
-        texture_bullet1 = load_texture('assets/images/bullet1.png')
-        def reduce_texture_resolution(texture, factor):
-            image = Image.open(texture.path)
-            image = image.resize((image.width // factor, image.height // factor), Image.LANCZOS)
-            return Texture(image)
-
-        texture_bullet0 = reduce_texture_resolution(texture_bullet0, 5)
-        texture_bullet1 = reduce_texture_resolution(texture_bullet1, 5)
+        # Downscaled once and shared by all the tanks
+        texture_bullet0 = texture_cache.derived('assets/images/bullet0.png', downscale=5)
+        texture_bullet1 = texture_cache.derived('assets/images/bullet1.png', downscale=5)
         self.bullet_pools: List[BulletPool] = []
         bullet = Bullet(owner=owner, model='cube', 
                    texture=texture_bullet0, 
@@ -344,8 +348,9 @@ class AmmoCatalog:
         bullet.velocity = Vec3(sin(math.radians(owner.rotation_z)) * self.bullet_pool.bullet_speed,
                             cos(math.radians(owner.rotation_z)) * self.bullet_pool.bullet_speed, 0)  # Set bullet velocity
         bullet.hit_damage = self.bullet_pool.hit_damage
+        self.game.projectiles.add(bullet, self.bullet_pool)
         if play_sound:
-            self.bullet_pool.shoot_sound.play()
+            self.bullet_pool.shoot_sound.play(priority=PRIORITY_HIGH)
 
     def choose_deployable(self, index):
         self.deploy_pool.choose_deployable(index)
@@ -367,5 +372,4 @@ class AmmoCatalog:
         for bullet_pool in self.bullet_pools:
             bullet_pool.destroy_bullets()
         destroy(self.bullet_effect)
-        destroy(self.shoot_sound0)
-        destroy(self.shoot_sound1)
+        self.deploy_pool.destroy()
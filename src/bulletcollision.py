@@ -0,0 +1,121 @@
+class BulletHit:
+    def __init__(self, entity, time_of_impact, point):
+        self.entity = entity
+        self.time_of_impact = time_of_impact  # Fraction of this frame's movement, from 0 to 1
+        self.point = point
+
+
+def sweep_aabb(x, y, dx, dy, half_width, half_height, box_x, box_y, box_half_width, box_half_height):
+    """
+    Time of impact of a box moving from (x, y) by (dx, dy) against a static box.
+    Returns a value from 0 to 1, or None if the boxes don't meet during the movement.
+    """
+    t_near, t_far = 0.0, 1.0
+    # The static box is expanded by the moving box, so the moving box can be treated as a point
+    for origin, delta, center, extent in ((x, dx, box_x, half_width + box_half_width),
+                                          (y, dy, box_y, half_height + box_half_height)):
+        low, high = center - extent, center + extent
+        if abs(delta) < 1e-9:
+            if origin <= low or origin >= high:
+                return None
+            continue
+        t_enter = (low - origin) / delta
+        t_exit = (high - origin) / delta
+        if t_enter > t_exit:
+            t_enter, t_exit = t_exit, t_enter
+        t_near = max(t_near, t_enter)
+        t_far = min(t_far, t_exit)
+        if t_near > t_far:
+            return None
+    return t_near
+
+
+class BulletCollisionEngine:
+    """
+    Continuous collision for bullets. The whole segment a bullet travels during a frame is tested against the
+    terrain grid and the tank boxes, so fast bullets can't step over a wall between two frames.
+    """
+    def __init__(self, game):
+        self.game = game
+
+    def cast(self, bullet, delta, ignore=None):
+        """Returns the first BulletHit along the bullet movement or None. ignore(entity) filters out targets"""
+        half = max(abs(bullet.scale_x), abs(bullet.scale_y)) / 2
+        return self.sweep(bullet.x, bullet.y, delta[0], delta[1], half, ignore)
+
+    def sweep(self, x, y, dx, dy, half, ignore=None):
+        """Same as cast for a square bullet box described by its center and half size"""
+        # Box around the whole swept path of the bullet
+        path_x, path_y = x + dx / 2, y + dy / 2
+        path_half_width, path_half_height = abs(dx) / 2 + half, abs(dy) / 2 + half
+
+        best_entity, best_time = None, None
+        candidates = self.game.terrain_grid.tiles_in_box(path_x, path_y, path_half_width, path_half_height)
+        candidates += [e for e in self.game.spatial_hash.query(path_x, path_y, path_half_width, path_half_height)
+                       if getattr(e, 'is_tank', False)]
+        for entity in candidates:
+            if not getattr(entity, 'takes_hit', False):
+                continue  # Grass, water and alike let the bullets fly over them
+            if ignore is not None and ignore(entity):
+                continue
+            time_of_impact = sweep_aabb(x, y, dx, dy, half, half,
+                                        entity.x, entity.y, abs(entity.scale_x) / 2, abs(entity.scale_y) / 2)
+            if time_of_impact is not None and (best_time is None or time_of_impact < best_time):
+                best_entity, best_time = entity, time_of_impact
+
+        if best_entity is None:
+            return None
+        return BulletHit(best_entity, best_time, (x + dx * best_time, y + dy * best_time))
+
+
+if __name__ == '__main__':
+    # Tunnelling checks: bullets stacked with MISSILE_SPEED_INCREASE drops must still stop at the first wall
+    from src.terraingrid import TerrainGrid
+    from src.misc.spatialhash import SpatialHash
+    from src.enums import CollisionEffect, EntityType
+
+    class Box:
+        def __init__(self, x, y, scale, **kwargs):
+            self.x, self.y = x, y
+            self.scale_x = self.scale_y = scale
+            self.__dict__.update(kwargs)
+
+    class Game:
+        def __init__(self):
+            self.terrain_grid = TerrainGrid(19, 13, 1)
+            self.spatial_hash = SpatialHash(1)
+
+    game = Game()
+    wall = Box(0, 0, 0.999, entity_type=EntityType.TERRAIN, collision_effect=CollisionEffect.BARRIER, takes_hit=True)
+    grass = Box(-1, 0, 0.999, entity_type=EntityType.TERRAIN, collision_effect=CollisionEffect.SLOW_DOWN, takes_hit=None)
+    far_wall = Box(5, 0, 0.999, entity_type=EntityType.TERRAIN, collision_effect=CollisionEffect.BARRIER, takes_hit=True)
+    tank = Box(0, 3, 1, entity_type=EntityType.ENEMY_TANK, takes_hit=True, is_tank=True)
+    for tile in (wall, grass, far_wall):
+        game.terrain_grid.add_tile(tile)
+    game.spatial_hash.insert(tank)
+    engine = BulletCollisionEngine(game)
+
+    frame_dt = 1 / 60
+    for bullet_speed in (10, 100, 1000, 10000):
+        bullet = Box(-4, 0, 0.1)
+        step = (bullet_speed * frame_dt, 0)
+        hit = engine.cast(bullet, step)
+        # The old approach only looked at where the bullet ended up after the step
+        old_end_x = bullet.x + step[0]
+        old_hit = abs(old_end_x - wall.x) < 0.55
+        assert hit is not None or bullet_speed * frame_dt < 3.45, bullet_speed
+        if hit is not None:
+            assert hit.entity is wall, bullet_speed
+            assert abs(hit.point[0] - (wall.x - 0.5 - 0.05)) < 1e-3, hit.point
+        print(f"speed {bullet_speed:>6}: swept hit {hit.entity is wall if hit else False}, "
+              f"toi {hit.time_of_impact if hit else None}, end point test hit {old_hit}")
+
+    # A frame spike moves the bullet through the wall and past the far wall, the first hit must win
+    hit = engine.cast(Box(-4, 0, 0.1), (20, 0))
+    assert hit.entity is wall
+
+    # Grass doesn't stop bullets and the filter lets bullets pass friendly tanks
+    assert engine.cast(Box(-3, 0, 0.1), (1.5, 0)) is None
+    assert engine.cast(Box(0, 6, 0.1), (0, -100)).entity is tank
+    assert engine.cast(Box(0, 6, 0.1), (0, -100), ignore=lambda e: e is tank).entity is wall
+    print("All tunnelling checks passed")
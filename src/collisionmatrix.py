@@ -0,0 +1,93 @@
+import numpy as np
+from src.enums import EntityType, Interaction
+from src.registry import TANK_TYPES
+
+# Tanks of the same team don't shoot each other unless friendly fire is enabled
+TEAMS = {
+    EntityType.PLAYER_TANK: 0,
+    EntityType.ENEMY_TANK: 1,
+    EntityType.BOSS: 1,
+}
+
+TYPES_COUNT = max(entity_type.value for entity_type in EntityType) + 1
+
+
+def layer(entity_type):
+    """Layer bit of the entity type"""
+    return 1 << entity_type.value if entity_type is not None else 0
+
+
+class CollisionMatrix:
+    """
+    Declarative table of what happens when an entity of one type touches another one.
+    The movement rules are keyed by (moving type, touched type), the projectile rules by (shooter type, hit type).
+    Both are precomputed into lookup tables indexed by the EntityType values.
+    """
+    def __init__(self, friendly_fire=False):
+        self.friendly_fire = friendly_fire
+        self.build()
+
+    def build(self):
+        self.movement_rules = {}
+        self.projectile_rules = {}
+        for mover in TANK_TYPES:
+            for other in TANK_TYPES:
+                self.movement_rules[(mover, other)] = Interaction.BLOCK
+            self.movement_rules[(mover, EntityType.TERRAIN)] = Interaction.TRIGGER
+            self.movement_rules[(mover, EntityType.BASE)] = Interaction.BLOCK
+            self.movement_rules[(mover, EntityType.SUPPLY_DROP)] = Interaction.PICKUP
+            self.movement_rules[(mover, EntityType.LANDMINE)] = Interaction.DAMAGE
+
+        for shooter in TANK_TYPES:
+            for target in TANK_TYPES:
+                friendly = TEAMS[shooter] == TEAMS[target]
+                # Friendly fire is the players' setting, NPCs never shoot their own team
+                player_friendly_fire = self.friendly_fire and shooter == target == EntityType.PLAYER_TANK
+                damages = not friendly or player_friendly_fire
+                self.projectile_rules[(shooter, target)] = Interaction.DAMAGE if damages else Interaction.IGNORE
+            self.projectile_rules[(shooter, EntityType.TERRAIN)] = Interaction.DAMAGE
+            self.projectile_rules[(shooter, EntityType.BASE)] = Interaction.DAMAGE
+
+        self.movement_table = self._to_table(self.movement_rules)
+        self.projectile_table = self._to_table(self.projectile_rules)
+        # Plain nested lists are faster than the NumPy tables for single lookups
+        self._movement = self.movement_table.tolist()
+        self._projectile = self.projectile_table.tolist()
+        self.movement_masks = self._to_masks(self.movement_table)
+        self.projectile_masks = self._to_masks(self.projectile_table)
+        self._interactions = list(Interaction)
+
+    @staticmethod
+    def _to_table(rules):
+        table = np.full((TYPES_COUNT, TYPES_COUNT), Interaction.IGNORE.value, dtype=np.int8)
+        for (first, second), interaction in rules.items():
+            table[first.value, second.value] = interaction.value
+        return table
+
+    @staticmethod
+    def _to_masks(table):
+        masks = []
+        for row in table:
+            mask = 0
+            for value, interaction in enumerate(row):
+                if interaction != Interaction.IGNORE.value:
+                    mask |= 1 << value
+            masks.append(mask)
+        return masks
+
+    def set_friendly_fire(self, enabled):
+        self.friendly_fire = enabled
+        self.build()
+
+    def movement(self, mover_type, other_type):
+        if mover_type is None or other_type is None:
+            return Interaction.IGNORE
+        return self._interactions[self._movement[mover_type.value][other_type.value]]
+
+    def projectile(self, shooter_type, target_type):
+        if shooter_type is None or target_type is None:
+            return Interaction.IGNORE
+        return self._interactions[self._projectile[shooter_type.value][target_type.value]]
+
+    def movement_mask(self, mover_type):
+        return self.movement_masks[mover_type.value] if mover_type is not None else 0
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
 from ursina import *
-import pygame
 import pprint
 import os
+import numpy as np
+from src.enums import EntityType
+from src.flowfield import FlowField, NO_DIRECTION, NEIGHBOURS
+from src.terraingrid import BARRIER
+from src.vision import line_of_sight
 
 class BaseController(ABC):
     @abstractmethod
@@ -19,8 +23,14 @@ class BaseController(ABC):
 
 
 class PS4Controller(BaseController):
+    def __init__(self):
+        self.controllers = []  # No joysticks until initialize_controller()
+        self.states = []
+
     def initialize_controller(self):
-        pygame.init()
+        import pygame  # Imported here, it takes a good part of the startup and only the joysticks need it
+        # Only the joysticks and the event queue, which needs the display module, pygame.init() also opens the mixer
+        pygame.display.init()
         pygame.joystick.init()
         self.controllers = []
         self.states = []
@@ -46,6 +56,7 @@ class PS4Controller(BaseController):
         return len(self.controllers)
 
     def refresh_buttons_state(self):
+        import pygame
         try:
             for event in pygame.event.get():
                 if event.type in (pygame.JOYAXISMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYHATMOTION):
@@ -118,6 +129,103 @@ class KeyboardController(BaseController):
         ret['pause'] = held_keys['escape'] == 1
         return ret
 
+BUTTONS = ('shoot', 'drop', 'up', 'down', 'left', 'right', 'previous_bullet', 'next_bullet', 'pause')
+
+
+class ScriptedController(BaseController):
+    """
+    Replays scripted button presses, one step per get_buttons_state call (once per simulation tick).
+    script(step) returns the names of the pressed buttons. Used by the headless matches.
+    """
+    def __init__(self, script):
+        self.script = script
+        self.step = 0
+
+    def initialize_controller(self):
+        self.step = 0
+
+    @property
+    def controllers_count(self):
+        return 1
+
+    def get_buttons_state(self, player_index: int = 0):
+        pressed = set(self.script(self.step))
+        self.step += 1
+        return {button: button in pressed for button in BUTTONS}
+
+
+class AIController(BaseController):
+    """
+    Bot for the headless matches: hunts the nearest NPC along a flow field and shoots when the NPC is lined up
+    in sight or a breakable wall is in the way. attach() must be called with the player it drives.
+    """
+    direction_buttons = ('up', 'right', 'down', 'left')  # By the flow field direction index
+
+    def __init__(self, game):
+        self.game = game
+        self.player = None
+        self.fire = False
+        self._field = None
+        self._field_key = None
+
+    def initialize_controller(self):
+        pass
+
+    def attach(self, player):
+        self.player = player
+
+    @property
+    def controllers_count(self):
+        return 1
+
+    def _field_to(self, target):
+        grid = self.game.terrain_grid
+        cell = grid.world_to_cell(target.x, target.y)
+        key = (id(grid), grid.version, cell)
+        if key != self._field_key:
+            self._field = FlowField(grid, [cell] if grid.in_bounds(*cell) else [])
+            self._field_key = key
+        return self._field
+
+    def _pull_trigger(self, state):
+        # A shot is fired on the press, so the button is released every other tick
+        self.fire = not self.fire
+        state['shoot'] = self.fire
+
+    def get_buttons_state(self, player_index: int = 0):
+        state = {button: False for button in BUTTONS}
+        player = self.player
+        if player is None or player.is_exploded:
+            return state
+        npcs = [npc for npc in self.game.registry.live_tanks(EntityType.ENEMY_TANK, EntityType.BOSS) if npc.enabled]
+        if not npcs:
+            return state
+        target = min(npcs, key=lambda npc: abs(npc.x - player.x) + abs(npc.y - player.y))
+        dx, dy = target.x - player.x, target.y - player.y
+        grid = self.game.terrain_grid
+
+        if min(abs(dx), abs(dy)) < 0.4:
+            blocked = (grid.flags & BARRIER) != 0
+            to_cells = lambda x, y: (np.array([(x - grid.left) / grid.tile_size]), np.array([(grid.top - y) / grid.tile_size]))
+            if line_of_sight(blocked, *to_cells(player.x, player.y), *to_cells(target.x, target.y))[0]:
+                if abs(dx) > abs(dy):
+                    state['right' if dx > 0 else 'left'] = True
+                else:
+                    state['up' if dy > 0 else 'down'] = True
+                self._pull_trigger(state)
+                return state
+
+        direction, _ = self._field_to(target).steer(player.x, player.y, (grid.tile_size - abs(player.scale_x)) / 2)
+        if direction == NO_DIRECTION:
+            return state
+        state[self.direction_buttons[direction]] = True
+        row, col = grid.world_to_cell(player.x, player.y)
+        next_row, next_col = row + NEIGHBOURS[direction][0], col + NEIGHBOURS[direction][1]
+        if grid.in_bounds(next_row, next_col) and grid.flags[next_row, next_col] & BARRIER:
+            self._pull_trigger(state)
+        return state
+
+
 if __name__ == '__main__':
     ps4ctrl = PS4Controller()
     ps4ctrl.initialize_controller()
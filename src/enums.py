@@ -24,4 +24,11 @@ class DropEffect(Enum):
     MISSILE_SPEED_INCREASE = 1
     MISSILE_RATE_INCREASE = 2
     LANDMINE_PICK = 3
-    BUILDING_BLOCK_PICK = 4
\ No newline at end of file
+    BUILDING_BLOCK_PICK = 4
+
+class Interaction(Enum):
+    IGNORE = 0
+    BLOCK = 1
+    DAMAGE = 2
+    PICKUP = 3
+    TRIGGER = 4
\ No newline at end of file
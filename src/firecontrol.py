@@ -0,0 +1,154 @@
+import math
+from enum import Enum
+from src.enums import EntityType
+from src.iq import NPCBehaviour
+from src.terraingrid import BASE, TAKES_HIT
+
+
+class FireTarget(Enum):
+    NOTHING = 0
+    PLAYER = 1
+    BASE = 2
+    DESTRUCTIBLE_WALL = 3
+
+
+# What an NPC shoots at by its behaviour: target -> (max distance in tiles or None for any, bullet pool index or None
+# for the chosen one). The walls are only shot when they are in the way, the bullets would hit them anyway.
+FIRE_POLICIES = {
+    NPCBehaviour.SHOOT_DEFAULT_BULLET: {
+        FireTarget.PLAYER: (None, None),
+        FireTarget.BASE: (None, None),
+        FireTarget.DESTRUCTIBLE_WALL: (2, None),
+    },
+    NPCBehaviour.SWITCH_BULELTS_WHEN_AVAILABLE: {
+        FireTarget.PLAYER: (None, 0),            # The fast bullet for the moving targets
+        FireTarget.BASE: (None, 1),              # The heavy one for the terrain
+        FireTarget.DESTRUCTIBLE_WALL: (3, 1),
+    },
+    NPCBehaviour.USE_LANDMINES: {
+        FireTarget.PLAYER: (None, None),
+        FireTarget.BASE: (None, None),
+        FireTarget.DESTRUCTIBLE_WALL: (2, None),
+    },
+}
+
+# Row and column steps of the facing directions, in the order of the rotation_z quarters: up, right, down, left
+FACING_STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+BULLET_HALF_SIZE = 0.075
+
+
+class FireControl:
+    """
+    Decides whether an NPC pulls the trigger, so the bullets are only shot at something they can hit.
+    The lane in front of the tank is traced over the terrain grid up to the first tile that stops bullets,
+    the lanes are cached per cell and facing until the terrain changes. A player in the lane closer than
+    that tile is a target, otherwise the tile itself (the base or a destructible wall) may be one.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.lanes = {}  # (row, col, facing) -> (FireTarget of the first hit tile, its distance in tiles)
+        self._grid_key = None
+        self.shots = 0
+        self.holds = 0
+
+    def _sync_terrain(self):
+        grid = self.game.terrain_grid
+        key = (id(grid), grid.version)
+        if key != self._grid_key:
+            self._grid_key = key
+            self.lanes.clear()
+        return grid
+
+    def lane(self, row, col, facing):
+        """First tile that stops the bullets shot from the cell towards the facing, FireTarget.NOTHING at the map edge"""
+        key = (row, col, facing)
+        lane = self.lanes.get(key)
+        if lane is None:
+            grid = self.game.terrain_grid
+            step_row, step_col = FACING_STEPS[facing]
+            flags = grid.flags
+            lane = (FireTarget.NOTHING, math.inf)
+            distance = 0
+            while True:
+                row, col = row + step_row, col + step_col
+                distance += 1
+                if not grid.in_bounds(row, col):
+                    break
+                cell = flags[row, col]
+                if cell & TAKES_HIT:
+                    lane = (FireTarget.BASE if cell & BASE else FireTarget.DESTRUCTIBLE_WALL, distance)
+                    break
+            self.lanes[key] = lane
+        return lane
+
+    def target(self, npc):
+        """What the bullet of the NPC would hit first and how far it is in tiles"""
+        grid = self._sync_terrain()
+        facing = round(npc.rotation_z / 90) % 4
+        step_row, step_col = FACING_STEPS[facing]
+        row, col = grid.world_to_cell(npc.x, npc.y)
+        wall, wall_distance = self.lane(row, col, facing)
+        if grid.in_bounds(row, col) and grid.flags[row, col] & TAKES_HIT:
+            wall, wall_distance = FireTarget.BASE if grid.flags[row, col] & BASE else FireTarget.DESTRUCTIBLE_WALL, 0
+
+        nearest = None
+        for player in self.game.registry.live_tanks(EntityType.PLAYER_TANK):
+            dx, dy = player.x - npc.x, player.y - npc.y
+            along = (dx * step_col - dy * step_row) / grid.tile_size
+            across = abs(dx * step_row + dy * step_col)
+            reach = max(abs(player.scale_x), abs(player.scale_y)) / 2 + BULLET_HALF_SIZE
+            if 0 < along < wall_distance and across < reach and (nearest is None or along < nearest):
+                nearest = along
+        if nearest is not None:
+            return FireTarget.PLAYER, nearest
+        return wall, wall_distance
+
+    def decide(self, npc):
+        """Bullet pool index to shoot with (-1 keeps the chosen one) or None to hold the fire"""
+        target, distance = self.target(npc)
+        policy = FIRE_POLICIES[npc.npc_config.behaviour].get(target)
+        if policy is None:
+            self.holds += 1
+            return None
+        max_distance, bullet_index = policy
+        if max_distance is not None and distance > max_distance:
+            self.holds += 1
+            return None
+        self.shots += 1
+        return -1 if bullet_index is None else bullet_index
+
+    def reset_stats(self):
+        self.shots = self.holds = 0
+
+
+if __name__ == '__main__':
+    # Lanes of an NPC on a small map with a wall, the base and a player
+    from types import SimpleNamespace
+    from src.terraingrid import TerrainGrid
+    from src.registry import EntityRegistry
+    from src.enums import CollisionEffect
+    from src.iq import NPCIqConfig, NPCMissionType
+
+    grid = TerrainGrid(19, 13, 1)
+    game = SimpleNamespace(terrain_grid=grid, registry=EntityRegistry())
+    fire_control = FireControl(game)
+    grid.add_tile(SimpleNamespace(x=0, y=-6, scale_x=1, scale_y=1, entity_type=EntityType.BASE,
+                                  collision_effect=CollisionEffect.BARRIER, effect_strength=0, takes_hit=True))
+    grid.add_tile(SimpleNamespace(x=-4, y=0, scale_x=1, scale_y=1, entity_type=EntityType.TERRAIN,
+                                  collision_effect=CollisionEffect.BARRIER, effect_strength=0, takes_hit=True))
+    config = NPCIqConfig(NPCMissionType.FIND_AND_DESTROY_PLAYER, NPCBehaviour.SHOOT_DEFAULT_BULLET)
+    npc = SimpleNamespace(x=0, y=0, rotation_z=180, npc_config=config)
+    player = SimpleNamespace(x=0, y=-3.3, scale_x=0.8, scale_y=1, entity_type=EntityType.PLAYER_TANK, is_exploded=False)
+
+    assert fire_control.target(npc) == (FireTarget.BASE, 6)
+    game.registry.add(player)
+    assert fire_control.target(npc)[0] == FireTarget.PLAYER
+    npc.rotation_z = -90
+    assert fire_control.target(npc) == (FireTarget.DESTRUCTIBLE_WALL, 4)
+    assert fire_control.decide(npc) is None  # Too far to be in the way
+    npc.x = -2
+    assert fire_control.decide(npc) == -1
+    npc.rotation_z = 90
+    assert fire_control.target(npc) == (FireTarget.NOTHING, math.inf)
+    assert fire_control.decide(npc) is None
+    print("Fire control checks passed")
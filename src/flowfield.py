@@ -0,0 +1,348 @@
+import heapq
+import math
+import numpy as np
+from src.enums import EntityType
+from src.terraingrid import BARRIER, BASE, SLOW_DOWN, BURN, WET, TAKES_HIT
+
+# Cost of driving through a cell, the NPCs go around the slow and damaging ground when the detour is short
+GROUND_COST = 1
+SLOW_DOWN_COST = 2
+DAMAGING_COST = 4
+# On the way to the base a wall that bullets destroy is a way too, the NPC stops in front of it and shoots it down
+# (the base is walled in). The player fields keep every barrier impassable
+BREAKABLE_COST = 8
+
+# Direction indices, the same as the numeric keys of Game.directions
+UP, RIGHT, DOWN, LEFT = 0, 1, 2, 3
+NO_DIRECTION = -1
+# Row and column offsets of the neighbour cells, in direction index order. Row 0 is the top row of the map
+NEIGHBOURS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+
+def cell_costs(flags, breakable=False):
+    """Cost of entering every cell of the terrain grid, inf for the barriers. With breakable the walls bullets destroy cost BREAKABLE_COST"""
+    costs = np.full(flags.shape, GROUND_COST, dtype=np.float64)
+    costs[(flags & SLOW_DOWN) != 0] = SLOW_DOWN_COST
+    costs[(flags & (BURN | WET)) != 0] = DAMAGING_COST
+    barriers = (flags & BARRIER) != 0
+    if breakable:
+        costs[barriers] = np.where((flags[barriers] & TAKES_HIT) != 0, BREAKABLE_COST, np.inf)
+    else:
+        costs[barriers] = np.inf
+    return costs
+
+
+class FlowField:
+    """
+    Distance map from every cell of the terrain grid to a set of goal cells (Dijkstra over the 4 neighbours),
+    plus the direction of the next step for every cell. All the NPCs heading for the same goal share one field,
+    so steering an NPC is an array lookup. Terrain changes only repair the cells whose distance they affect.
+    """
+    def __init__(self, grid, goals=(), costs=None):
+        self.grid = grid
+        self.height, self.width = grid.flags.shape
+        # Plain lists are much faster than NumPy arrays for the per-cell work of the search
+        self.cost_array = (cell_costs(grid.flags) if costs is None else costs).ravel().copy()
+        self.costs = self.cost_array.tolist()
+        self._distances = [math.inf] * (self.height * self.width)
+        self.parents = [-1] * (self.height * self.width)  # Next cell on the way to the goal
+        self._neighbours = [self._cell_neighbours(index) for index in range(self.height * self.width)]
+        self.distances = np.full(self.height * self.width, np.inf)
+        self.directions = np.full((self.height, self.width), NO_DIRECTION, dtype=np.int8)
+        self.goals = set()
+        self.set_goals(goals)
+
+    def _cell_neighbours(self, index):
+        row, col = divmod(index, self.width)
+        neighbours = []
+        if row > 0:
+            neighbours.append(index - self.width)
+        if col < self.width - 1:
+            neighbours.append(index + 1)
+        if row < self.height - 1:
+            neighbours.append(index + self.width)
+        if col > 0:
+            neighbours.append(index - 1)
+        return neighbours
+
+    def set_goals(self, goals):
+        """Recomputes the whole field for the (row, col) goal cells"""
+        self.goals = {row * self.width + col for row, col in goals}
+        self._distances = [math.inf] * (self.height * self.width)
+        self.parents = [-1] * (self.height * self.width)
+        for goal in self.goals:
+            self._distances[goal] = 0
+        self._search([(0, goal) for goal in self.goals])
+        self._refresh_directions()
+
+    def _search(self, heap):
+        """Dijkstra from the cells in the heap, returns the cells whose distance changed"""
+        touched = set()
+        heapq.heapify(heap)
+        distances, parents, costs, neighbours = self._distances, self.parents, self.costs, self._neighbours
+        while heap:
+            distance, index = heapq.heappop(heap)
+            if distance > distances[index]:
+                continue
+            for neighbour in neighbours[index]:
+                new_distance = distance + costs[neighbour]
+                if new_distance < distances[neighbour]:
+                    distances[neighbour] = new_distance
+                    parents[neighbour] = index
+                    touched.add(neighbour)
+                    heapq.heappush(heap, (new_distance, neighbour))
+        return touched
+
+    def update_costs(self, costs):
+        """
+        Applies new cell costs and repairs only the affected region. A cell that got more expensive invalidates
+        the cells routed through it, they are searched again from the valid cells around them.
+        A cell that got cheaper is only relaxed outwards from itself. Returns the number of repaired cells.
+        """
+        costs = costs.ravel()
+        old_costs = self.cost_array
+        changed = np.flatnonzero(costs != old_costs)
+        if len(changed) == 0:
+            return 0
+        increased = changed[costs[changed] > old_costs[changed]].tolist()
+        decreased = changed[costs[changed] < old_costs[changed]].tolist()
+        self.cost_array = costs.copy()
+        for index in changed.tolist():
+            self.costs[index] = float(costs[index])
+        distances, parents, neighbours = self._distances, self.parents, self._neighbours
+
+        # Cells whose route to the goal runs through a more expensive cell
+        invalid = set()
+        stack = [index for index in increased if index not in self.goals and distances[index] < math.inf]
+        while stack:
+            index = stack.pop()
+            if index in invalid:
+                continue
+            invalid.add(index)
+            stack.extend(neighbour for neighbour in neighbours[index] if parents[neighbour] == index)
+        for index in invalid:
+            distances[index] = math.inf
+            parents[index] = -1
+
+        heap = []
+        for index in list(invalid) + decreased:
+            if index in self.goals:
+                continue
+            for neighbour in neighbours[index]:
+                new_distance = distances[neighbour] + self.costs[index]
+                if new_distance < distances[index]:
+                    distances[index] = new_distance
+                    parents[index] = neighbour
+            if distances[index] < math.inf:
+                heap.append((distances[index], index))
+        touched = self._search(heap) | invalid | set(decreased)
+        self._refresh_cells(touched)
+        return len(touched)
+
+    def _refresh_cells(self, cells):
+        """Updates the distances and the directions of the cells and of their neighbours"""
+        distances, neighbours, width = self._distances, self._neighbours, self.width
+        around = set(cells)
+        for index in cells:
+            around.update(neighbours[index])
+        for index in around:
+            self.distances[index] = distances[index]
+            best_direction, best_distance = NO_DIRECTION, distances[index]
+            row, col = divmod(index, width)
+            for direction, (row_offset, col_offset) in enumerate(NEIGHBOURS):
+                neighbour_row, neighbour_col = row + row_offset, col + col_offset
+                if 0 <= neighbour_row < self.height and 0 <= neighbour_col < width:
+                    neighbour_distance = distances[neighbour_row * width + neighbour_col]
+                    if neighbour_distance < best_distance:
+                        best_direction, best_distance = direction, neighbour_distance
+            self.directions[row, col] = best_direction
+
+    def _refresh_directions(self):
+        self.distances = np.array(self._distances)
+        distances = self.distances.reshape(self.height, self.width)
+        padded = np.pad(distances, 1, constant_values=np.inf)
+        neighbour_distances = np.stack([
+            padded[1 + row_offset:1 + row_offset + self.height, 1 + col_offset:1 + col_offset + self.width]
+            for row_offset, col_offset in NEIGHBOURS])
+        best = neighbour_distances.argmin(axis=0)
+        downhill = np.take_along_axis(neighbour_distances, best[None], axis=0)[0] < distances
+        self.directions = np.where(downhill, best, NO_DIRECTION).astype(np.int8)
+
+    def distance_at(self, x, y):
+        row, col = self.grid.world_to_cell(x, y)
+        if not self.grid.in_bounds(row, col):
+            return np.inf
+        return self.distances[row * self.width + col]
+
+    def direction_at(self, x, y):
+        """Direction index of the next step from the world position, NO_DIRECTION at the goal or when it's unreachable"""
+        row, col = self.grid.world_to_cell(x, y)
+        if not self.grid.in_bounds(row, col):
+            return NO_DIRECTION
+        return int(self.directions[row, col])
+
+    def steer(self, x, y, slack):
+        """
+        Direction index and the longest allowed step for a tank at the world position. Before turning into the
+        next cell the tank is centered on the other axis, slack is how far off the center the tank still fits
+        through a one tile gap. The step is limited only while centering, so the tank can't overshoot.
+        """
+        row, col = self.grid.world_to_cell(x, y)
+        if not self.grid.in_bounds(row, col):
+            return NO_DIRECTION, None
+        direction = int(self.directions[row, col])
+        if direction == NO_DIRECTION:
+            return NO_DIRECTION, None
+        center_x, center_y = self.grid.cell_to_world(row, col)
+        if direction in (UP, DOWN) and abs(x - center_x) > slack:
+            return (RIGHT if center_x > x else LEFT), abs(center_x - x)
+        if direction in (LEFT, RIGHT) and abs(y - center_y) > slack:
+            return (UP if center_y > y else DOWN), abs(center_y - y)
+        return direction, None
+
+
+class Navigation:
+    """
+    Flow fields shared by all NPCs: one per player, following the player's cell, and one to the base tiles.
+    The fields are checked against the terrain grid once per simulation tick and repaired incrementally.
+    """
+    def __init__(self, game):
+        self.game = game
+        self._grid_id = None
+        self._grid_version = None
+        self._costs = None       # Cost map of the player fields
+        self._base_costs = None  # Cost map of the base field, through the breakable walls
+        self.player_fields = {}  # id(player) -> (player cell, FlowField)
+        self.base_field = None
+
+    def _sync_terrain(self):
+        grid = self.game.terrain_grid
+        if id(grid) != self._grid_id:
+            # A new level, the fields of the old map are useless
+            self._grid_id = id(grid)
+            self._grid_version = grid.version
+            self._costs = cell_costs(grid.flags)
+            self._base_costs = cell_costs(grid.flags, breakable=True)
+            self.player_fields.clear()
+            self.base_field = None
+        elif grid.version != self._grid_version:
+            self._grid_version = grid.version
+            self._costs = cell_costs(grid.flags)
+            self._base_costs = cell_costs(grid.flags, breakable=True)
+            for _, field in self.player_fields.values():
+                field.update_costs(self._costs)
+            if self.base_field is not None:
+                goals = self._base_cells(grid)
+                if {row * grid.width + col for row, col in goals} != self.base_field.goals:
+                    # A base tile was destroyed or built
+                    self.base_field.costs = self._base_costs.ravel().tolist()
+                    self.base_field.cost_array = self._base_costs.ravel().copy()
+                    self.base_field.set_goals(goals)
+                else:
+                    self.base_field.update_costs(self._base_costs)
+
+    @staticmethod
+    def _base_cells(grid):
+        return [(int(row), int(col)) for row, col in zip(*np.nonzero((grid.flags & BASE) != 0))]
+
+    def field_to_player(self, player):
+        self._sync_terrain()
+        grid = self.game.terrain_grid
+        cell = grid.world_to_cell(player.x, player.y)
+        known = self.player_fields.get(id(player))
+        if known is None:
+            field = FlowField(grid, [cell] if grid.in_bounds(*cell) else [], self._costs)
+            self.player_fields[id(player)] = (cell, field)
+            return field
+        known_cell, field = known
+        if known_cell != cell:
+            field.set_goals([cell] if grid.in_bounds(*cell) else [])
+            self.player_fields[id(player)] = (cell, field)
+        return field
+
+    def field_to_base(self):
+        """Distance field to the base tiles, built once per level and then only repaired on terrain changes"""
+        self._sync_terrain()
+        if self.base_field is None:
+            grid = self.game.terrain_grid
+            self.base_field = FlowField(grid, self._base_cells(grid), self._base_costs)
+        return self.base_field
+
+    def forget(self, entity):
+        self.player_fields.pop(id(entity), None)
+
+    def tick(self, dt):
+        self._sync_terrain()
+        players = {id(player) for player in self.game.registry.of_type(EntityType.PLAYER_TANK)}
+        for key in [key for key in self.player_fields if key not in players]:
+            del self.player_fields[key]
+
+
+if __name__ == '__main__':
+    # Benchmark: 50 NPCs steering to 4 players and the base on the shipped level with the most barriers
+    import glob
+    import os
+    import random
+    import time as pytime
+    from types import SimpleNamespace
+    from src.tileloader import TileLoader
+    from src.enums import CollisionEffect
+
+    def barrier_count(tmx_file):
+        return int(((TileLoader.load_terrain_grid(tmx_file, 1).flags & BARRIER) != 0).sum())
+
+    tmx_file = max(sorted(glob.glob('assets/levels/level*.tmx')), key=barrier_count)
+    grid = TileLoader.load_terrain_grid(tmx_file, 1)
+    free_cells = list(zip(*np.nonzero((grid.flags & BARRIER) == 0)))
+    print(f"{os.path.basename(tmx_file)}: {grid.width}x{grid.height}, {len(free_cells)} free cells")
+
+    # The players are hunted around the walls, only the way to the base leads through the breakable ones
+    navigation = Navigation(SimpleNamespace(terrain_grid=grid))
+    hunted = SimpleNamespace(x=grid.cell_to_world(*free_cells[0])[0], y=grid.cell_to_world(*free_cells[0])[1])
+    barriers = ((grid.flags & BARRIER) != 0).ravel()
+    assert np.isinf(navigation.field_to_player(hunted).distances[barriers]).all()
+    walls = ((grid.flags & BARRIER) != 0).ravel() & ((grid.flags & BASE) == 0).ravel()
+    assert np.isfinite(navigation.field_to_base().distances[walls]).any()
+
+    costs = cell_costs(grid.flags)
+    start = pytime.perf_counter()
+    fields = [FlowField(grid, [random.choice(free_cells)], costs) for _ in range(4)]
+    print(f"4 player fields built in {(pytime.perf_counter() - start) * 1000:.3f} ms")
+
+    npcs = [grid.cell_to_world(*random.choice(free_cells)) for _ in range(50)]
+    ticks = 600
+    start = pytime.perf_counter()
+    for _ in range(ticks):
+        for x, y in npcs:
+            fields[0].steer(x, y, 0.1)
+    per_tick = (pytime.perf_counter() - start) / ticks
+    print(f"50 NPC lookups: {per_tick * 1000:.3f} ms per tick")
+
+    # A building block placed halfway on the longest route and then destroyed, incremental repair against a full rebuild
+    field = fields[0]
+    reachable = np.flatnonzero(field.distances < np.inf)
+    route = [int(reachable[field.distances[reachable].argmax()])]
+    while field.parents[route[-1]] >= 0:
+        route.append(int(field.parents[route[-1]]))
+    row, col = divmod(route[len(route) // 2], field.width)
+    block = SimpleNamespace(x=grid.cell_to_world(row, col)[0], y=grid.cell_to_world(row, col)[1],
+                            entity_type=EntityType.TERRAIN, collision_effect=CollisionEffect.BARRIER, takes_hit=True)
+    reference = FlowField(grid, [divmod(next(iter(field.goals)), field.width)], costs)
+    repeats = 200
+    incremental = full = 0
+    repaired = 0
+    for _ in range(repeats):
+        for action in (grid.add_tile, grid.remove_tile):
+            action(block)
+            new_costs = cell_costs(grid.flags)
+            start = pytime.perf_counter()
+            repaired += field.update_costs(new_costs)
+            incremental += pytime.perf_counter() - start
+            reference.costs = new_costs.ravel().tolist()
+            start = pytime.perf_counter()
+            reference.set_goals([divmod(goal, field.width) for goal in field.goals])
+            full += pytime.perf_counter() - start
+            assert np.array_equal(field.distances, reference.distances)
+            assert np.array_equal(field.directions, reference.directions)
+    print(f"Building block placed/destroyed: {repaired / repeats / 2:.0f} cells repaired in "
+          f"{incremental / repeats / 2 * 1000:.3f} ms, full rebuild {full / repeats / 2 * 1000:.3f} ms")
@@ -3,6 +3,7 @@ from typing import List
 from src.settings import Settings
 from src.levels import get_levels_count
 from src.enums import CollisionEffect, EntityType
+from src.collisionmatrix import CollisionMatrix, layer
 from src.npc import NpcSpawner
 from src.startmenu import StartMenu
 from src.player import Player
@@ -10,22 +11,43 @@ from src.game_save import SaveManager
 from src.controller import PS4Controller
 from datetime import datetime
 from src.tileloader import TileLoader
+from src.misc.spatialhash import SpatialHash
+from src.terraingrid import TerrainGrid
+from src.bulletcollision import BulletCollisionEngine
+from src.projectiles import ProjectileSystem
+from src.registry import EntityRegistry, TERRAIN_TYPES, TANK_TYPES
+from src.spawnslots import SpawnSlots
+from src.simclock import SimulationClock
+from src.vision import VisionService
+from src.firecontrol import FireControl
+from src.flowfield import Navigation
+from src.aischeduler import AIScheduler
+from src.squads import SquadPlanner
+from src.misc.texturecache import texture_cache
+from src.misc.audiopool import audio_voices, PRIORITY_HIGH
+from src.terrainbatch import TerrainBatch
+from src.levelpreloader import LevelPreloader
+from src.misc.startup import startup
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False):
         self.settings = Settings()
         self.tileloader = TileLoader(self, 1)
-        camera.orthographic = True
-        camera.fov = self.settings.camera_fov
-        window.size = self.settings.window_size
-        window.monitor = self.settings.monitor
-        window.fullscreen = self.settings.fullscreen
-        window.exit_button.visible = False
+        self.headless = headless  # No window and no camera, see src/simulator.py
+        audio_voices.null = headless  # Nothing to hear, the sounds aren't even loaded
+        if not headless:
+            camera.orthographic = True
+            camera.fov = self.settings.camera_fov
+        if application.window_type == 'onscreen':  # An offscreen buffer, e.g. of the startup benchmark, has no window to set up
+            window.size = self.settings.window_size
+            window.monitor = self.settings.monitor
+            window.fullscreen = self.settings.fullscreen
+            window.exit_button.visible = False
         self.tanks = [] # Includes NPC and player tanks
-        self.level_complete_audio = Audio("assets/audio/level_complete.ogg", autoplay=False, volume=1.0)
 
         self.players = []
-        self.start_menu = StartMenu(self, start_game_callback=self._start_new_game, continue_game_callback=self._continue_game)
+        with startup.phase('start menu'):
+            self.start_menu = StartMenu(self, start_game_callback=self._start_new_game, continue_game_callback=self._continue_game)
         self.player_positions = [
             Vec2(-2, self.settings.screen_bottom),
             Vec2(2, self.settings.screen_bottom),
@@ -40,12 +62,26 @@ class Game:
         self.right_edge = 0.5 * self.aspect_ratio
         self.top_edge = 0.5
         self.bottom_edge = -0.5 # The bottom edge of the screen
-        self.no_barrier_entities = []
         self.over = False
         self.level_complete = False
         self.tile_size = self.settings.tile_size
-        self.terrain_entities = []
-        self.active_bullets = []
+        self.terrain_entities = {} # id(entity) -> entity, terrain elements, drops and deployables
+        self.registry = EntityRegistry()
+        self.spatial_hash = SpatialHash(self.tile_size)
+        # Replaced by the TileLoader with a grid matching the loaded map
+        self.terrain_grid = TerrainGrid(self.settings.horizontal_game_area + 1, self.settings.vertical_game_area + 1, self.tile_size)
+        self.collision_matrix = CollisionMatrix(self.settings.friendly_fire)
+        self.bullet_collision = BulletCollisionEngine(self)
+        self.projectiles = ProjectileSystem(self)
+        self.spawn_slots = SpawnSlots(self)
+        self.terrain_batch = TerrainBatch(self)
+        self.level_preloader = LevelPreloader(self, self.settings.level_preload_budget_ms)
+        self.vision = VisionService(self)
+        self.navigation = Navigation(self)
+        self.squad_planner = SquadPlanner(self)
+        self.ai_scheduler = AIScheduler(self, self.settings.ai_think_budget_ms)
+        self.fire_control = FireControl(self)
+        self.clock = SimulationClock(self, self.settings.simulation_rate, self.settings.max_catch_up_ticks)
         self.save_file_path = ""
         self._initial_state = {}
 
@@ -116,39 +152,43 @@ class Game:
             stat_text.visible = visible
             stat_value.visible = visible        
     
+    def create_player(self, controller, controller_id, position_index, character, color):
+        player = Player(
+            game=self,
+            max_durability=character.max_durability,
+            controller=controller,
+            controller_id = controller_id,
+            player_id=position_index,
+            model='quad',
+            texture=character.initial_texture,
+            position=self.player_positions[position_index],
+            z=0,
+            scale=(0.8, 1),
+            color=color,
+            collider='box',
+            rigidbody=True,
+            is_tank=True,
+            can_shoot=True,
+            max_speed=character.max_speed,
+            takes_hit=True,
+            is_exploded=False,
+            remove_counter=0,
+            remove_limit=3,
+        )
+        self.players.append(player)
+        return player
+
     def _start_new_game(self, controller_avatars: list):
         position_index = 0
         controller_id = 0
         for controller_avatar in controller_avatars:
             controller = controller_avatar.controller
             character = controller_avatar.parent.character
-            player = Player(
-                game=self,
-                max_durability=character.max_durability,
-                controller=controller,
-                controller_id = controller_id,
-                player_id=position_index,
-                model='quad',
-                texture=character.initial_texture,
-                position=self.player_positions[position_index],
-                z=0,
-                scale=(0.8, 1),
-                color=controller_avatar.parent.color,
-                collider='box',
-                rigidbody=True,
-                is_tank=True,
-                can_shoot=True,
-                max_speed=character.max_speed,
-                takes_hit=True,
-                is_exploded=False,
-                remove_counter=0,
-                remove_limit=3,
-            )
+            self.create_player(controller, controller_id, position_index, character, controller_avatar.parent.color)
             if isinstance(controller, PS4Controller):
                 # Increasing controller ID only for the joysticks. The keyboard doesn't require the index
                 controller_id += 1
             position_index += 1
-            self.players.append(player)
 
         self._initialize(0)
 
@@ -157,6 +197,7 @@ class Game:
         for player in players:
             player.initial_position = self.player_positions[player.player_id]
             player.position = self.player_positions[player.player_id]
+            self.update_entity_position(player)
             self.players.append(player)
         
         self._initialize(level)
@@ -188,11 +229,13 @@ class Game:
         return Vec2((pos_text.x / self.right_edge) * self.settings.horizontal_span / 2,
                     (pos_text.y / self.top_edge) * self.settings.vertical_span / 2)
 
-    def update_no_barrier_entities(self):
-        self.no_barrier_entities = [e for e in scene.entities if hasattr(e, "collision_effect") and e.collision_effect != CollisionEffect.BARRIER]
+    @property
+    def no_barrier_entities(self):
+        return self.registry.no_barriers()
 
-    def update_barrier_entities(self):
-        self.barrier_entities = [e for e in scene.entities if hasattr(e, "collision_effect") and e.collision_effect == CollisionEffect.BARRIER]
+    @property
+    def barrier_entities(self):
+        return self.registry.barriers()
 
     def show_game_over(self):
         self.start_menu.show_game_over_menu()
@@ -229,7 +272,9 @@ class Game:
         )
         
         self.level_complete = True
-        self.level_complete_audio.play()
+        audio_voices.play("assets/audio/level_complete.ogg", priority=PRIORITY_HIGH)
+        if self.level_index + 1 < self.levels_count:
+            self.level_preloader.start(self.level_index + 1)  # Ready by the time the player presses shoot
 
     def show_you_win(self):
         background = Entity(
@@ -271,10 +316,10 @@ class Game:
 
     def destroy_terrain_elements(self):
         """Removes terrain elements. Doesn't affect the player objects"""
-        tmp = [e for e in self.terrain_entities]
+        tmp = list(self.terrain_entities.values())
         for entity in tmp:
             destroy(entity)
-        self.terrain_entities = []
+        self.terrain_entities.clear()
 
     def total_cleanup(self):
         """Removes everything, including terrain elements, player objects and droppings"""
@@ -287,6 +332,9 @@ class Game:
         for tank in self.tanks:
             tank.on_destroy = lambda: None # Disabling on destroy spawn more or show game complete actions
             tank.destroy()
+        self.spawn_slots.clear_queue()
+        self.level_preloader.cancel()
+        self.clock.reset()
         self.destroy_terrain_elements()
         self.players.clear()
         self.tanks.clear()
@@ -301,11 +349,70 @@ class Game:
         print("----------------------------------------------------")
 
     def create_tile_map(self):
-        self.tileloader.load(f"assets/levels/level{self.level}.tmx")             
+        self.tileloader.load(f"assets/levels/level{self.level}.tmx")
+        self.terrain_batch.flush()             
+
+    def tick(self, dt):
+        """Advances the gameplay by one fixed step of dt seconds, called by the simulation clock"""
+        registry = self.registry
+        self.vision.tick(dt)
+        self.navigation.tick(dt)
+        self.squad_planner.tick(dt)
+        self.ai_scheduler.tick(dt)
+        for entity in registry.of_type(*TANK_TYPES, EntityType.LANDMINE, EntityType.SUPPLY_DROP):
+            if entity in registry:  # May have been destroyed by an earlier entity of this tick
+                entity.tick(dt)
+        self.projectiles.tick(dt)
+        self.spawn_slots.tick(dt)
+
+    def register_entity(self, entity):
+        """Adds the entity to the collision and lookup structures"""
+        self.registry.add(entity)
+        if entity.collider:
+            # Collider-free terrain is only reachable through the terrain grid
+            self.spatial_hash.insert(entity)
+        if entity.entity_type in TERRAIN_TYPES:
+            self.terrain_grid.add_tile(entity)
+        elif entity.entity_type in TANK_TYPES:
+            self.spawn_slots.update_tank(entity)
+
+    def unregister_entity(self, entity):
+        self.registry.remove(entity)
+        self.spatial_hash.remove(entity)
+        self.terrain_grid.remove_tile(entity)
+        self.spawn_slots.remove_tank(entity)
+
+    def update_entity_position(self, entity):
+        """Must be called after a tank changed its position"""
+        self.spatial_hash.update(entity)
+        self.spawn_slots.update_tank(entity)
+
+    def add_terrain_entity(self, entity):
+        """Registers a terrain element, drop or deployable so that collision queries can find it"""
+        entity.on_destroy = lambda e=entity: self.remove_terrain_entity(e)
+        self.terrain_entities[id(entity)] = entity
+        self.register_entity(entity)
+        if self.terrain_batch.batchable(entity):
+            self.terrain_batch.add(entity)
+
+    def relocate_terrain_entity(self, entity, position):
+        if entity.entity_type in TERRAIN_TYPES and not self.terrain_grid.in_bounds(*self.terrain_grid.world_to_cell(position[0], position[1])):
+            destroy(entity)  # E.g. a block deployed over the edge, it would stand nowhere on the battlefield
+            return
+        entity.position = position
+        if entity.collider:
+            self.spatial_hash.update(entity)
+        if entity.entity_type in TERRAIN_TYPES:
+            self.terrain_grid.add_tile(entity)
+        self.terrain_batch.move(entity)
 
     def remove_terrain_entity(self, entity):
-        if entity in self.terrain_entities: 
-            self.terrain_entities.remove(entity)
+        self.unregister_entity(entity)
+        self.terrain_entities.pop(id(entity), None)
+        self.terrain_batch.remove(entity)
+        texture_source = getattr(entity, 'texture_source', None)
+        if texture_source:
+            texture_cache.release(*texture_source)
         
     @property
     def level(self):
@@ -354,6 +461,14 @@ class Game:
         """
         collided_entities = []
 
+        # Only the entities in the cells around the requested position that the entity interacts with can collide
+        half_extent = SpatialHash.half_extent(entity)
+        mask = self.collision_matrix.movement_mask(getattr(entity, 'entity_type', None))
+        candidates = [e for e in self.spatial_hash.query(position[0], position[1], half_extent, half_extent)
+                      if mask & layer(getattr(e, 'entity_type', None))]
+        if not candidates:
+            return collided_entities
+
         # Save the original position of the entity
         original_position = entity.position
 
@@ -361,7 +476,7 @@ class Game:
         entity.position = position
 
         # Check for collisions at the new position
-        for e in scene.entities:
+        for e in candidates:
             if entity != e and e.collider:
                 if entity.intersects(e).hit:
                     collided_entities.append(e)
@@ -377,28 +492,32 @@ class Game:
         
         if entity.entity_type == EntityType.PLAYER_TANK:
             entity.position = entity.initial_position
+            self.update_entity_position(entity)
             print("Player has been recovered")
             return
 
-        positions = list(range(self.settings.screen_left, self.settings.screen_right))
-        random.shuffle(positions)
-        
-        for i in positions:
-            position = (i, self.settings.screen_top)
-            entity.position = position
-            collided_entities = self.get_collided_entities_at_position(entity, position)
-            if len(collided_entities) == 0:
-                print("Tank has been spawned!")
-                entity.visible = True
-                break
+        column = self.spawn_slots.take()
+        if column is None:
+            # Keep the tank out of the game until a spawn slot frees up, out of the registry nothing ticks it
+            entity.disable()
+            self.unregister_entity(entity)
+            self.spawn_slots.enqueue(entity)
+            print("No free spawn slot, tank is queued")
+            return
+
+        entity.enable()
+        entity.position = (column, self.settings.screen_top)
+        if entity not in self.registry:  # Back from the spawn queue
+            self.register_entity(entity)
+        self.update_entity_position(entity)
+        print("Tank has been spawned!")
+        entity.visible = True
     
     def get_collided_barriers(self, entity : Entity):
         colliding_entities = []
-        for e in self.barrier_entities:
-            if e == None:
-                self.barrier_entities.remove(e)
-                continue
-            if entity.intersects(e):
+        half_width, half_height = abs(entity.scale_x) / 2, abs(entity.scale_y) / 2
+        for e in self.terrain_grid.tiles_in_box(entity.x, entity.y, half_width, half_height):
+            if e.collision_effect == CollisionEffect.BARRIER and entity.intersects(e).hit:
                 colliding_entities.append(e)
 
         return colliding_entities
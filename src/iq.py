@@ -1,9 +1,10 @@
-from ursina import Vec3, Entity, time, raycast
+from ursina import Vec3, Entity
 import math
 import numpy as np
 from enum import Enum
-from src.misc.utils import rotate_vector_around_y
 from src.enums import *
+from src.flowfield import NO_DIRECTION
+from src.terraingrid import EDGE_TOLERANCE
 import random
 
 
@@ -25,59 +26,30 @@ class NPCIqConfig:
         self.behaviour = behaviour
         self.visibility = math.radians(visibility)
         self.distance = distance
-        self.scanning_step = math.radians(45) / distance
         
 
 class NPCIntelligence:
     def __init__(self, owner: Entity, iq_config: NPCIqConfig):
         self.owner = owner
         self.iq_config = iq_config
-        self.scan_range = np.arange(-iq_config.visibility, iq_config.visibility, self.iq_config.scanning_step)
-        self.scan_index = 0
-        self.scan_index_max = len(self.scan_range) - 1
         self.turn_time_counter = 0
         self.next_turn_time = random.uniform(0.0, 0.5)
         self.direction = 0
-        self.target_player = None  # Single player tracking, otherwise npc gets crazy
-        self.last_known_player_position = None
-        self.wandering = False
-        self.locked_on_player = False
-        self.lost_player_timer = 0
-        self.lost_player_timeout = 3  
-        self.scan_timer = random.uniform(0.5, 1.0)  
-        self.player_last_position = None
-        self.player_movement_direction = Vec3(0, 0, 0)
-        self.detection_buffer = 0  # Detection memory counter
-        self.detection_threshold = 2  # Number of consecutive detections required
-
-    @property
-    def next_scan_angle(self):
-        if self.scan_index < self.scan_index_max:
-            self.scan_index += 1
-        else:
-            self.scan_index = 0
-        return self.scan_range[self.scan_index]
-
-    def next_scan_vector(self, direction_vector):
-        return rotate_vector_around_y(direction_vector, self.next_scan_angle)
-
-    def get_random_direction(self):
+        self.target_player = None  # The target of the squad
+        self.locked_on_player = False  # The squad is engaged, the AI scheduler thinks more often then
+        self.step_limit = None  # Longest step of the current direction, set while centering on a flow field path
+        self.squad = None  # Set by the SquadPlanner, the squad then picks the target and the route
+
+    def get_random_direction(self, dt):
         if self.turn_time_counter > self.next_turn_time:
             self.direction = random.randint(0, 3)  
             self.turn_time_counter = 0
             self.next_turn_time = random.uniform(1, 5)
-        self.turn_time_counter += time.dt
+        self.turn_time_counter += dt
         return self.owner.game.directions[self.direction]
 
-    def scan_player_movement(self, player):
-        """ Tracks the player's last movement direction every scan interval. """
-        if self.player_last_position:
-            movement_vector = player.position - self.player_last_position
-            if movement_vector.length() > 0:  
-                self.player_movement_direction = movement_vector.normalized()
-        self.player_last_position = player.position
-
-    def snap_to_smart_direction(self, player_position):
+    def snap_to_smart_direction(self, player_position, flank=None):
+        """ flank 'vertical' or 'horizontal' is the alignment a squad member should take, see src/squads.py """
         dx = player_position.x - self.owner.position.x
         dy = player_position.y - self.owner.position.y
 
@@ -89,65 +61,53 @@ class NPCIntelligence:
         # If already aligned on y-axis, move horizontally
         if abs(dy) < align_threshold:
             return Vec3(np.sign(dx), 0, 0)
-        
+
+        if flank == 'vertical':
+            return Vec3(np.sign(dx), 0, 0)  # Moving sideways into the column of the target
+        if flank == 'horizontal':
+            return Vec3(0, np.sign(dy), 0)
+
         if abs(dx) > abs(dy): # find the shortest alignment
             return Vec3(0, np.sign(dy), 0) # Moving vertically as it's faster
         elif abs(dx) < abs(dy):
             return Vec3(np.sign(dx), 0, 0)
 
-    def get_direction(self):
-        """ Determines movement based on detected player, last known position, or random wandering. 
-            TODO: later other missions will be also implemented
+    def follow_field(self, field):
+        """Direction of the next step along the flow field or None if the target can't be reached from here"""
+        owner = self.owner
+        # How far off the cell center the tank still fits through a one tile gap
+        slack = max(EDGE_TOLERANCE / 2, (field.grid.tile_size - abs(owner.scale_x)) / 2 - EDGE_TOLERANCE)
+        direction, self.step_limit = field.steer(owner.x, owner.y, slack)
+        if direction == NO_DIRECTION:
+            return None
+        return owner.game.directions[direction]
+
+    def follow_squad(self, dt):
+        """ Local steering of a squad member, the target and the route come from the squad plan """
+        squad = self.squad
+        if squad.mission == NPCMissionType.DESTROY_BASE:
+            direction = self.follow_field(squad.route) if squad.route is not None else None
+            return direction if direction is not None else self.get_random_direction(dt)
+
+        target = squad.target
+        if squad.engaged and target is not None and not target.is_exploded:
+            flank = squad.flanks.get(id(self.owner))
+            if self.owner.game.vision.sees(self.owner, target):
+                return self.snap_to_smart_direction(target.position, flank)
+            direction = self.follow_field(squad.route) if squad.route is not None else None
+            if direction is not None:
+                return direction
+            return self.snap_to_smart_direction(squad.last_known_position or target.position, flank)
+        return self.get_random_direction(dt)
+
+    def get_direction(self, dt):
+        """ Direction of the next move, the SquadPlanner gives every spawned NPC its target and route.
+            dt is the simulation time since the last think.
         """
-        if self.iq_config.mission == NPCMissionType.FIND_AND_DESTROY_PLAYER:
-            direction_vector = self.owner.direction_vector
-            vec = self.next_scan_vector(direction_vector)
-            hitinfo = raycast(self.owner.position, vec, self.iq_config.distance, ignore=[self.owner], debug=False)
-            
-            if hitinfo.hit:
-                entity = next((e for e in hitinfo.entities if hasattr(e, "collision_effect") and e.collision_effect == CollisionEffect.BARRIER), None)
-                if hasattr(entity, "entity_type") and entity.entity_type == EntityType.PLAYER_TANK:
-                    if self.target_player is None:
-                        self.target_player = entity  
-                    if self.target_player == entity:
-                        self.detection_buffer += 1
-                        if self.detection_buffer >= self.detection_threshold:
-                            print(f"{self} locked onto player tank")
-                            self.last_known_player_position = entity.position
-                            self.wandering = False
-                            self.locked_on_player = True
-                            self.detection_buffer = 0
-                            self.lost_player_timer = 0  
-                            return Vec3(0, 0, 0)  
-
-            else:
-                self.detection_buffer = max(0, self.detection_buffer - 1)  
-                if self.locked_on_player:
-                    self.lost_player_timer += time.dt
-                    if self.lost_player_timer >= self.lost_player_timeout:
-                        print(f"{self} lost track of player, switching to wandering mode")
-                        self.target_player = None  
-                        self.last_known_player_position = None
-                        self.wandering = True
-                        self.locked_on_player = False
-
-        if self.locked_on_player and self.last_known_player_position:
-            self.scan_timer -= time.dt
-            if self.scan_timer <= 0:
-                self.scan_player_movement(self.target_player)
-                self.scan_timer = random.uniform(0.5, 1.0)
-
-            snapped_direction = self.snap_to_smart_direction(self.last_known_player_position)
-            if (self.owner.position - self.last_known_player_position).length() < 0.5:
-                self.last_known_player_position = None
-                self.wandering = True
-                self.locked_on_player = False
-            return snapped_direction
-
-        if self.wandering or not self.locked_on_player:
-            return self.get_random_direction()
-
-        return self.owner.direction_vector
+        self.step_limit = None
+        if self.squad is None:
+            return self.get_random_direction(dt)  # Not enlisted, e.g. after the squads were reset
+        return self.follow_squad(dt)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,247 @@
+"""
+Compiled levels: a .tmx map with its tilesets turned into NumPy arrays that are memory-mapped on load,
+instead of parsing the XML, the base64/zlib layers and the .tsx files on every level change.
+
+File layout: MAGIC, format version (uint16), JSON header length (uint32), the JSON header (map size, texture
+table, source stamps), padding to 8 bytes, the placed tiles (x, y, gid) and the gid table with the tile
+properties. The cache is rebuilt when a source file changed, by mtime first and by content hash if the mtime
+moved but the content didn't.
+
+    python -m src.levelcache [--force] [--folder assets/levels]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import struct
+import tempfile
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+
+MAGIC = b'TMLC'
+FORMAT_VERSION = 1
+CACHE_FOLDER = '.cache'  # Next to the .tmx files
+PREAMBLE = struct.Struct('<4sHI')
+
+TILE_DTYPE = np.dtype([('x', '<i2'), ('y', '<i2'), ('gid', '<u4')])
+# Missing properties are -1 for the enums and takes_hit, NaN for the numbers
+GID_DTYPE = np.dtype([
+    ('gid', '<u4'),
+    ('texture', '<i2'),
+    ('entity_type', 'i1'),
+    ('collision_effect', 'i1'),
+    ('takes_hit', 'i1'),
+    ('effect_strength', '<f4'),
+    ('durability', '<f4'),
+    ('damaging', '<f4'),
+])
+
+
+def cache_path(tmx_file):
+    folder, name = os.path.split(tmx_file)
+    return os.path.join(folder, CACHE_FOLDER, os.path.splitext(name)[0] + '.tmlc')
+
+
+def source_files(tmx_file):
+    """The map and the external tilesets it uses"""
+    folder = os.path.dirname(tmx_file)
+    root = ElementTree.parse(tmx_file).getroot()
+    tilesets = [os.path.normpath(os.path.join(folder, tileset.get('source')))
+                for tileset in root.findall('tileset') if tileset.get('source')]
+    return [os.path.normpath(tmx_file)] + tilesets
+
+
+def _file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def _stamps(paths):
+    return {path: {'mtime_ns': os.stat(path).st_mtime_ns, 'sha1': _file_hash(path)} for path in paths}
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _number(value):
+    """Tiled int properties come back as int, the rest as float, a missing one as None"""
+    value = float(value)
+    if math.isnan(value):
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def compile_level(tmx_file, path=None):
+    """Parses the map with pytmx and writes its compiled form. Returns the path of the compiled file"""
+    import pytmx
+    path = path or cache_path(tmx_file)
+    tmx_data = pytmx.TiledMap(tmx_file)
+    textures, texture_indexes = [], {}
+    gid_rows, gid_indexes = [], {}
+    tiles = []
+    for layer in tmx_data.visible_layers:
+        if not isinstance(layer, pytmx.TiledTileLayer):
+            continue
+        for x, y, gid in layer:
+            image = tmx_data.get_tile_image_by_gid(gid)
+            if not image:
+                continue
+            if gid not in gid_indexes:
+                texture = os.path.normpath(image[0])
+                if texture not in texture_indexes:
+                    texture_indexes[texture] = len(textures)
+                    textures.append(texture)
+                props = tmx_data.get_tile_properties_by_gid(gid) or {}
+                takes_hit = props.get('takes_hit')
+                gid_indexes[gid] = len(gid_rows)
+                gid_rows.append((gid, texture_indexes[texture],
+                                 -1 if props.get('entity_type') is None else props['entity_type'],
+                                 -1 if props.get('collision_effect') is None else props['collision_effect'],
+                                 -1 if takes_hit is None else int(bool(takes_hit)),
+                                 *(math.nan if props.get(name) is None else props[name]
+                                   for name in ('effect_strength', 'durability', 'damaging'))))
+            tiles.append((x, y, gid))
+
+    header = json.dumps({
+        'width': tmx_data.width,
+        'height': tmx_data.height,
+        'textures': textures,
+        'tiles': len(tiles),
+        'gids': len(gid_rows),
+        'sources': _stamps(source_files(tmx_file)),
+    }).encode('utf-8')
+    tiles_offset = _align(PREAMBLE.size + len(header))
+    tiles_array = np.array(tiles, dtype=TILE_DTYPE)
+    gids_array = np.array(gid_rows, dtype=GID_DTYPE)
+    gids_offset = _align(tiles_offset + tiles_array.nbytes)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        file.write(header)
+        file.write(b'\0' * (tiles_offset - file.tell()))
+        file.write(tiles_array.tobytes())
+        file.write(b'\0' * (gids_offset - file.tell()))
+        file.write(gids_array.tobytes())
+    os.replace(temporary, path)  # Readers never see a half written file
+    return path
+
+
+class CompiledLevel:
+    """A compiled map. tiles and gids are read-only memory maps of the compiled file"""
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            magic, version, header_length = PREAMBLE.unpack(file.read(PREAMBLE.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a compiled level of version {FORMAT_VERSION}")
+            self.header = json.loads(file.read(header_length))
+        self.path = path
+        self.width = self.header['width']
+        self.height = self.header['height']
+        self.textures = self.header['textures']
+        tiles_offset = _align(PREAMBLE.size + header_length)
+        gids_offset = _align(tiles_offset + self.header['tiles'] * TILE_DTYPE.itemsize)
+        self.tiles = self._map(path, TILE_DTYPE, tiles_offset, self.header['tiles'])
+        self.gids = self._map(path, GID_DTYPE, gids_offset, self.header['gids'])
+        self._gid_properties = None
+
+    @staticmethod
+    def _map(path, dtype, offset, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+    def is_fresh(self):
+        """True while the sources are the ones the level was compiled from"""
+        for source, stamp in self.header['sources'].items():
+            try:
+                if os.stat(source).st_mtime_ns == stamp['mtime_ns']:
+                    continue
+                if _file_hash(source) != stamp['sha1']:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def gid_properties(self):
+        """gid -> (texture path, properties dict as the TileLoader reads them from pytmx)"""
+        if self._gid_properties is None:
+            self._gid_properties = {}
+            for row in self.gids:
+                props = {}
+                if row['entity_type'] >= 0:
+                    props['entity_type'] = int(row['entity_type'])
+                if row['collision_effect'] >= 0:
+                    props['collision_effect'] = int(row['collision_effect'])
+                if row['takes_hit'] >= 0:
+                    props['takes_hit'] = bool(row['takes_hit'])
+                for name in ('effect_strength', 'durability', 'damaging'):
+                    value = _number(row[name])
+                    if value is not None:
+                        props[name] = value
+                self._gid_properties[int(row['gid'])] = (self.textures[row['texture']], props)
+        return self._gid_properties
+
+    def placed_tiles(self):
+        """(x, y, texture path, properties) of every tile in the layer order, x and y in map cells"""
+        properties = self.gid_properties()
+        for x, y, gid in self.tiles.tolist():
+            texture, props = properties[gid]
+            yield x, y, texture, props
+
+
+def _fresh_level(path):
+    """The compiled level at path or None if there is none or its sources changed"""
+    if os.path.exists(path):
+        try:
+            level = CompiledLevel(path)
+            if level.is_fresh():
+                return level
+        except (ValueError, KeyError, OSError):
+            pass  # An old format or a broken file, compiled again
+    return None
+
+
+def load_level(tmx_file):
+    """The compiled level, compiled first if there is no cache yet or its sources changed"""
+    path = cache_path(tmx_file)
+    # A read-only assets folder keeps its levels compiled in the temp folder instead
+    temp_path = os.path.join(tempfile.gettempdir(), 'tanksmental', os.path.basename(path))
+    level = _fresh_level(path) or _fresh_level(temp_path)
+    if level is not None:
+        return level
+    try:
+        return CompiledLevel(compile_level(tmx_file, path))
+    except OSError:
+        return CompiledLevel(compile_level(tmx_file, temp_path))
+
+
+if __name__ == '__main__':
+    import time as pytime
+    import pytmx
+    parser = argparse.ArgumentParser(description='Precompiles the levels')
+    parser.add_argument('--folder', default='assets/levels')
+    parser.add_argument('--force', action='store_true', help='Compile even the levels with a fresh cache')
+    args = parser.parse_args()
+
+    for tmx_file in sorted(glob.glob(os.path.join(args.folder, '*.tmx'))):
+        path = cache_path(tmx_file)
+        fresh = os.path.exists(path) and not args.force and CompiledLevel(path).is_fresh()
+        if not fresh:
+            compile_level(tmx_file, path)
+
+        start = pytime.perf_counter()
+        tmx_data = pytmx.TiledMap(tmx_file)
+        for layer in tmx_data.visible_layers:
+            for x, y, gid in layer:
+                tmx_data.get_tile_image_by_gid(gid), tmx_data.get_tile_properties_by_gid(gid)
+        parse_time = pytime.perf_counter() - start
+        start = pytime.perf_counter()
+        tiles = list(load_level(tmx_file).placed_tiles())
+        load_time = pytime.perf_counter() - start
+        print(f"{tmx_file}: {'fresh' if fresh else 'compiled'}, {len(tiles)} tiles, {os.path.getsize(path)} bytes, "
+              f"pytmx {parse_time * 1000:.2f} ms -> cache {load_time * 1000:.2f} ms")
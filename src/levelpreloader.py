@@ -0,0 +1,147 @@
+import threading
+import time as pytime
+from ursina import Entity, destroy, scene
+from panda3d.core import TexturePool, Filename
+from direct.showbase import ShowBaseGlobal
+from src.levelcache import load_level
+from src.levels import load_npcs
+from src.terraingrid import TerrainGrid
+from src.misc.texturecache import texture_cache
+from src.misc.spranimator import sprite_clips
+from src.misc.atlas import texture_atlas
+
+IDLE = 'idle'
+LOADING = 'loading'      # The worker thread reads the compiled map, the images and the NPC pools
+BUILDING = 'building'    # The tile entities are created in frame budgeted slices, hidden
+READY = 'ready'          # Waits for the player to leave the level complete screen
+SPAWNING = 'spawning'    # The next level is live, the first wave comes in one tank per frame
+
+
+class LevelPreloader(Entity):
+    """
+    Prepares the next level while the level complete screen is shown, so pressing shoot only swaps the terrain.
+    The files are read on a worker thread, the scene graph is built on the main thread within a time budget
+    per frame. activate() finishes whatever is left synchronously, so it works even if called right away.
+    """
+    def __init__(self, game, budget_ms=4, **kwargs):
+        super().__init__(name='level_preloader', **kwargs)
+        self.game = game
+        self.budget = budget_ms / 1000
+        self.state = IDLE
+        self.level_index = None
+        self.staging_root = Entity(name='preloaded_tiles', visible=False)
+        self.staged = []  # Tile entities of the next level, not registered in the game yet
+        self._thread = None
+        self._prepared = None  # (CompiledLevel, NPC pools) from the worker thread
+        self._tiles = None
+        self._spawns = None
+
+    def tmx_file(self, level_index):
+        return f"assets/levels/level{level_index + 1}.tmx"
+
+    def start(self, level_index):
+        self.cancel()
+        self.level_index = level_index
+        self.state = LOADING
+        self._thread = threading.Thread(target=self._prepare, args=(level_index,), name='level_preloader', daemon=True)
+        self._thread.start()
+
+    def _prepare(self, level_index):
+        try:
+            self._prepared = self._load(level_index)
+        except Exception as error:
+            # activate() loads again on the main thread, where the error can surface normally
+            print(f"Preloading level {level_index + 1} failed: {error}")
+
+    def _load(self, level_index):
+        level = load_level(self.tmx_file(level_index))
+        for texture, _ in self.texture_files(level):
+            TexturePool.loadTexture(Filename.fromOsSpecific(texture))  # Decoded into the pool, Texture() only looks it up
+        return level, load_npcs(level_index)
+
+    @staticmethod
+    def texture_files(level):
+        """(path, filtering) the tiles of the level are drawn with, atlas pages in place of the packed images"""
+        # The atlas was read on the main thread when the first level was built, the lookups here only read it
+        files = set()
+        for texture in level.textures:
+            region = texture_atlas.region(texture)
+            files.add((region.page, region.filtering) if region is not None else (texture, 'mipmap'))
+        return files
+
+    def _advance(self, deadline):
+        if self.state == LOADING:
+            if self._thread.is_alive():
+                if deadline is not None:
+                    return
+                self._thread.join()
+            if self._prepared is None:
+                self._prepared = self._load(self.level_index)
+            self._tiles = self._prepared[0].placed_tiles()
+            self.state = BUILDING
+
+        if self.state == BUILDING:
+            level = self._prepared[0]
+            tileloader = self.game.tileloader
+            for x, y, tile_texture, tile_props in self._tiles:
+                self.staged.append(tileloader.create_tile(x, y, tile_texture, tile_props, level.width, level.height,
+                                                          parent=self.staging_root))
+                if deadline is not None and pytime.perf_counter() >= deadline:
+                    return
+            self._upload_textures(level)
+            self.state = READY
+
+    def _upload_textures(self, level):
+        """Sends the tile images to the GPU now rather than in the first frame of the level"""
+        base = getattr(ShowBaseGlobal, 'base', None)
+        if self.game.headless or base is None or base.win is None:
+            return
+        prepared_objects = base.win.getGsg().getPreparedObjects()
+        for texture_source in self.texture_files(level):
+            texture_cache.acquire(*texture_source)._texture.prepare(prepared_objects)
+            texture_cache.release(*texture_source)
+
+    def activate(self, level_index):
+        """Replaces the current level with the preloaded one, loading it here first if it wasn't preloaded"""
+        if self.level_index != level_index or self.state in (IDLE, SPAWNING):
+            self.start(level_index)
+        self._advance(None)
+
+        game = self.game
+        level, npc_pools = self._prepared
+        game.destroy_terrain_elements()
+        game.terrain_grid = TerrainGrid(level.width, level.height, game.tileloader.tile_size)
+        for tile in self.staged:
+            game.add_terrain_entity(tile)
+            if tile.parent == self.staging_root:
+                tile.parent = scene  # Not drawn by the terrain batch
+        self.staged = []
+        sprite_clips.evict_unused()  # Before the textures, it hands its frames back to the cache
+        texture_cache.evict_unused()
+        game.terrain_batch.flush()
+
+        game.npc_spawner.load_level_npcs(level_index, npc_pools)
+        self._spawns = game.npc_spawner.initial_spawns()
+        self._prepared = None
+        self.state = SPAWNING
+
+    def cancel(self):
+        """Drops a preloaded level that won't be played"""
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
+        for tile in self.staged:
+            texture_cache.release(*tile.texture_source)
+            destroy(tile)
+        self.staged = []
+        self._prepared = None
+        self._tiles = None
+        self._spawns = None
+        self.state = IDLE
+
+    def update(self):
+        if self.state in (LOADING, BUILDING):
+            self._advance(pytime.perf_counter() + self.budget)
+        elif self.state == SPAWNING:
+            if next(self._spawns, None) is None:
+                self._spawns = None
+                self.state = IDLE
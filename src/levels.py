@@ -1,6 +1,7 @@
 from ursina import *
 from src.enums import EntityType
 
+# Waves per level. A wave may set 'mission' to an NPCMissionType, FIND_AND_DESTROY_PLAYER by default
 npcs = [
             [
                 {
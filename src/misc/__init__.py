@@ -1,3 +1,23 @@
-from src.misc.utils import *
-from src.misc.spranimator import SpriteAnimator, AnimatedTile
-from src.misc.timer import Timer
\ No newline at end of file
+"""
+The helpers, imported on first access like the names of the src package, so src.misc.startup stays free of ursina.
+"""
+import importlib
+
+_EXPORTS = {
+    'SpriteAnimator': 'src.misc.spranimator',
+    'AnimatedTile': 'src.misc.spranimator',
+    'Timer': 'src.misc.timer',
+    'SpatialHash': 'src.misc.spatialhash',
+}
+_STAR_MODULES = ('src.misc.utils',)  # Re-exported with *
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    if not name.startswith('_'):
+        for module_name in _STAR_MODULES:
+            module = importlib.import_module(module_name)
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError(f"module 'src.misc' has no attribute '{name}'")
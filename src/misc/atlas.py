@@ -0,0 +1,288 @@
+"""
+Texture atlases: the tileset images, the drop icons, the effects and the animation frames packed into a few
+pages, so the entities using them share one texture and the renderer stops switching texture state. An entity
+shows its image through the UV offset and scale of its region, a frame animation only moves the offset.
+
+The pages and the manifest (regions in pixels and UVs, source stamps) are built on the first use and again
+when a source image or tileset changed, like the compiled levels.
+
+    python -m src.misc.atlas [--force]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from typing import NamedTuple
+from src.misc.texturecache import texture_cache
+
+ATLAS_FOLDER = 'assets/.cache/atlas'
+MANIFEST = 'atlas.json'
+FORMAT_VERSION = 1
+PAGE_SIZE = 1024
+PADDING = 4  # Edge pixels repeated around every region, so filtering and the smaller mipmaps don't bleed
+
+
+def tileset_images(levels_folder='assets/levels'):
+    images = []
+    for tsx_file in sorted(glob.glob(os.path.join(levels_folder, '*.tsx'))):
+        for image in ElementTree.parse(tsx_file).getroot().iter('image'):
+            images.append(os.path.normpath(os.path.join(levels_folder, image.get('source'))))
+    return images
+
+
+def animation_frames(folder):
+    names = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
+    return [os.path.join(folder, f) for f in sorted(names, key=lambda f: int(f.split('.')[0]))]
+
+
+def page_sources():
+    """Page group -> (filtering, images). An image packed in an earlier group is left out of the later ones"""
+    return {
+        'tiles': ('mipmap', tileset_images()),
+        'sprites': ('default', [
+            'assets/images/gun.png',
+            'assets/images/fast_bullet.png',
+            'assets/images/machine_gun.png',
+            'assets/images/landmine.png',
+            'assets/images/joystick_outline.png',
+            'assets/images/wet_effect.png',
+            'assets/images/fire_effect.png',
+            'assets/images/aim.png',
+            *animation_frames('assets/animations/explosion'),
+            *animation_frames('assets/animations/landmine_explosion'),
+        ]),
+    }
+
+
+def _file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def _pack(sizes, page_size, padding):
+    """Shelf packing of (width, height) from the tallest. Returns (page, x, y) per size, x and y inside the padding"""
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    placements = [None] * len(sizes)
+    page, x, y, shelf_height = 0, 0, 0, 0
+    for i in order:
+        width, height = sizes[i][0] + 2 * padding, sizes[i][1] + 2 * padding
+        if width > page_size or height > page_size:
+            raise ValueError(f"An image of {sizes[i]} doesn't fit an atlas page of {page_size}")
+        if x + width > page_size:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if y + height > page_size:
+            page, x, y, shelf_height = page + 1, 0, 0, 0
+        placements[i] = (page, x + padding, y + padding)
+        x += width
+        shelf_height = max(shelf_height, height)
+    return placements
+
+
+def _paste_padded(page, image, x, y, padding):
+    """Pastes the image and repeats its outermost pixels into the padding around it"""
+    width, height = image.size
+    page.paste(image, (x, y))
+    for offset in range(1, padding + 1):
+        page.paste(image.crop((0, 0, width, 1)), (x, y - offset))
+        page.paste(image.crop((0, height - 1, width, height)), (x, y + height - 1 + offset))
+    for offset in range(1, padding + 1):
+        page.paste(page.crop((x, y - padding, x + 1, y + height + padding)), (x - offset, y - padding))
+        page.paste(page.crop((x + width - 1, y - padding, x + width, y + height + padding)), (x + width - 1 + offset, y - padding))
+
+
+def build_atlas(folder=ATLAS_FOLDER, page_size=PAGE_SIZE, padding=PADDING):
+    """Packs the pages and writes them with the manifest into folder. Returns the path of the manifest"""
+    from PIL import Image
+    os.makedirs(folder, exist_ok=True)
+    pages, regions, sources = {}, {}, {}
+    for group, (filtering, images) in page_sources().items():
+        images = [os.path.normpath(image) for image in images if os.path.normpath(image) not in regions]
+        loaded = [Image.open(image).convert('RGBA') for image in images]
+        placements = _pack([image.size for image in loaded], page_size, padding)
+        canvases = [Image.new('RGBA', (page_size, page_size)) for _ in range(max((p[0] for p in placements), default=-1) + 1)]
+        for path, image, (page_index, x, y) in zip(images, loaded, placements):
+            _paste_padded(canvases[page_index], image, x, y, padding)
+            width, height = image.size
+            regions[path] = {
+                'page': f"{group}{page_index}",
+                'rect': [x, y, width, height],
+                # Panda3D's v runs up from the bottom row of the image
+                'offset': [x / page_size, (page_size - y - height) / page_size],
+                'scale': [width / page_size, height / page_size],
+            }
+            sources[path] = {'mtime_ns': os.stat(path).st_mtime_ns, 'sha1': _file_hash(path)}
+        for page_index, canvas in enumerate(canvases):
+            name = f"{group}{page_index}"
+            file = os.path.join(folder, name + '.png')
+            canvas.save(file + '.tmp.png')
+            os.replace(file + '.tmp.png', file)
+            pages[name] = {'file': os.path.normpath(file), 'filtering': filtering}
+    for tsx_file in glob.glob('assets/levels/*.tsx'):
+        sources[os.path.normpath(tsx_file)] = {'mtime_ns': os.stat(tsx_file).st_mtime_ns, 'sha1': _file_hash(tsx_file)}
+
+    manifest_path = os.path.join(folder, MANIFEST)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump({'version': FORMAT_VERSION, 'page_size': page_size, 'pages': pages, 'regions': regions,
+                   'sources': sources}, file, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)  # Written last, a manifest always has its pages
+    return manifest_path
+
+
+def manifest_is_fresh(manifest):
+    if manifest.get('version') != FORMAT_VERSION:
+        return False
+    wanted = {os.path.normpath(image) for _, images in page_sources().values() for image in images}
+    if wanted != set(manifest['regions']):
+        return False
+    for source, stamp in manifest['sources'].items():
+        try:
+            if os.stat(source).st_mtime_ns == stamp['mtime_ns']:
+                continue
+            if _file_hash(source) != stamp['sha1']:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class AtlasRegion(NamedTuple):
+    """Where an image is in its atlas page, offset and scale are the texture_offset and texture_scale to show it"""
+    page: str
+    filtering: str
+    offset: tuple
+    scale: tuple
+
+
+class TextureAtlas:
+    """
+    Runtime lookup of the atlas regions by the path of the original image. The manifest is read, and built if
+    needed, on the first lookup. The atlas holds its pages for the whole run, so region users don't release them.
+    """
+    def __init__(self, folder=ATLAS_FOLDER):
+        self.folder = folder
+        self.regions = None
+        self.pages = {}     # page name -> Texture
+        self.enabled = True  # False falls back to the separate images, e.g. to compare them
+
+    def _load(self):
+        manifest = None
+        manifest_path = os.path.join(self.folder, MANIFEST)
+        try:
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            if not manifest_is_fresh(manifest):
+                manifest = None
+        except (OSError, ValueError, KeyError):
+            pass
+        if manifest is None:
+            try:
+                manifest_path = build_atlas(self.folder)
+            except OSError:
+                # A read-only assets folder, the atlas is built in the temp folder on every start instead
+                self.folder = os.path.join(tempfile.gettempdir(), 'tanksmental', 'atlas')
+                manifest_path = build_atlas(self.folder)
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+        self.regions = {}
+        for path, region in manifest['regions'].items():
+            page = manifest['pages'][region['page']]
+            self.regions[path] = AtlasRegion(page['file'], page['filtering'], tuple(region['offset']), tuple(region['scale']))
+
+    def region(self, path):
+        """The region of the image at path or None if it isn't in the atlas"""
+        if not self.enabled:
+            return None
+        if self.regions is None:
+            self._load()
+        return self.regions.get(os.path.normpath(path))
+
+    def page_texture(self, region):
+        texture = self.pages.get(region.page)
+        if texture is None:
+            texture = self.pages[region.page] = texture_cache.acquire(region.page, region.filtering)
+        return texture
+
+    def lookup(self, path):
+        """(texture, region) of the image at path, region None and the image's own texture without an atlas"""
+        region = self.region(path)
+        if region is None:
+            return texture_cache.acquire(path), None
+        return self.page_texture(region), region
+
+
+texture_atlas = TextureAtlas()
+
+
+def show_region(entity, region):
+    """Shows the region of its texture on the entity, None shows the whole texture"""
+    entity.texture_scale = region.scale if region is not None else (1, 1)
+    entity.texture_offset = region.offset if region is not None else (0, 0)
+
+
+def use_atlas_image(entity, path):
+    """Gives the entity the image at path, as a region of an atlas page when the image is packed"""
+    region = texture_atlas.region(path)
+    if region is None:
+        entity.texture = path
+        return
+    entity.texture = texture_atlas.page_texture(region)
+    show_region(entity, region)
+
+
+if __name__ == '__main__':
+    # Builds the atlas and compares the draw calls of the tiles of every level, separate textures against the pages
+    import time as pytime
+    parser = argparse.ArgumentParser(description='Builds the texture atlas')
+    parser.add_argument('--force', action='store_true', help='Build even if the atlas is fresh')
+    args = parser.parse_args()
+
+    start = pytime.perf_counter()
+    manifest_path = os.path.join(ATLAS_FOLDER, MANIFEST)
+    fresh = False
+    if not args.force and os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            fresh = manifest_is_fresh(json.load(file))
+    if not fresh:
+        build_atlas()
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    print(f"{'Fresh' if fresh else 'Built'} in {(pytime.perf_counter() - start) * 1000:.1f} ms: "
+          f"{len(manifest['regions'])} images in {len(manifest['pages'])} pages {sorted(manifest['pages'])}")
+
+    from panda3d.core import loadPrcFileData
+    loadPrcFileData('', 'audio-library-name null')
+    from types import SimpleNamespace
+    from ursina import Ursina, destroy
+    app = Ursina(window_type='offscreen', development_mode=False)
+    from src.tileloader import TileLoader
+    from src.terrainbatch import TerrainBatch
+
+    # The tile loader uses the module imported under its package name, not this __main__ copy
+    from src.misc.atlas import texture_atlas as loader_atlas
+
+    class Game(SimpleNamespace):
+        def add_terrain_entity(self, tile):
+            self.tiles.append(tile)
+
+    for tmx_file in sorted(glob.glob('assets/levels/level*.tmx')):
+        results = []
+        for enabled in (False, True):
+            loader_atlas.enabled = enabled
+            game = Game(tile_size=1, headless=False, tiles=[])
+            TileLoader(game, 1).load(tmx_file)
+            batch = TerrainBatch(game)
+            for tile in game.tiles:
+                batch.add(tile)
+            batch.flush()
+            results.append((len(batch.meshes), len({mesh.texture for mesh in batch.meshes.values()})))
+            for tile in game.tiles:
+                destroy(tile)
+            for mesh in batch.meshes.values():
+                destroy(mesh)
+            destroy(batch.tiles_root)
+            destroy(batch)
+        print(f"{tmx_file}: chunk draw calls {results[0][0]} -> {results[1][0]}, "
+              f"textures {results[0][1]} -> {results[1][1]}")
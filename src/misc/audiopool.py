@@ -0,0 +1,170 @@
+from ursina import Audio, application
+from panda3d.core import AudioSound, Filename
+from direct.showbase import ShowBaseGlobal
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2  # The player's own sounds and the music like sounds, they take a voice from the lower ones
+MAX_VOICES = 4     # Voices per clip unless the pool says otherwise
+
+
+class Voice:
+    """
+    Handle of one playing sound. It goes stale when its voice is taken by a later play() of the same clip,
+    after that stop() does nothing and playing is False.
+    """
+    __slots__ = ('pool', 'index', 'generation')
+
+    def __init__(self, pool, index, generation):
+        self.pool = pool
+        self.index = index
+        self.generation = generation
+
+    @property
+    def playing(self):
+        pool = self.pool
+        return pool.generations[self.index] == self.generation and pool.sounds[self.index].status() == AudioSound.PLAYING
+
+    def stop(self):
+        if self.pool.generations[self.index] == self.generation:
+            self.pool.sounds[self.index].stop()
+
+
+class NullVoice:
+    """What play() returns with the null backend or when the sound was dropped"""
+    __slots__ = ()
+    playing = False
+
+    def stop(self):
+        pass
+
+
+NULL_VOICE = NullVoice()
+
+
+class VoicePool:
+    """
+    Up to max_voices sounds of one clip, shared by every entity playing it. A play() takes a free voice, or the
+    lowest priority and oldest playing one if its priority isn't higher than the new sound's, or is dropped.
+    """
+    def __init__(self, manager, path, max_voices=MAX_VOICES, volume=1.0):
+        self.manager = manager
+        self.path = path
+        self.max_voices = max_voices
+        self.volume = volume
+        self.sounds = []       # AudioSound per voice, created on demand
+        self.priorities = []   # Priority of the sound the voice plays or played last
+        self.generations = []  # Bumped on every play, stale Voice handles compare against it
+        self.started = []      # Play counter value when the voice started, the lowest one is the oldest
+        self.plays = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def _free_voice(self, priority):
+        for index, sound in enumerate(self.sounds):
+            if sound.status() != AudioSound.PLAYING:
+                return index
+        if len(self.sounds) < self.max_voices:
+            sound = self.manager.load_sound(self.path)
+            self.sounds.append(sound)
+            self.priorities.append(priority)
+            self.generations.append(0)
+            self.started.append(0)
+            return len(self.sounds) - 1
+        victim = min(range(len(self.sounds)), key=lambda index: (self.priorities[index], self.started[index]))
+        if self.priorities[victim] > priority:
+            return None
+        self.sounds[victim].stop()
+        self.stolen += 1
+        return victim
+
+    def play(self, priority=PRIORITY_NORMAL, volume=1.0, loop=False):
+        if self.manager.null:
+            return NULL_VOICE
+        index = self._free_voice(priority)
+        if index is None:
+            self.dropped += 1
+            return NULL_VOICE
+        self.plays += 1
+        sound = self.sounds[index]
+        sound.setVolume(self.volume * volume * Audio.volume_multiplier)
+        sound.setLoop(loop)
+        sound.setTime(0)
+        sound.play()
+        self.priorities[index] = priority
+        self.generations[index] += 1
+        self.started[index] = self.plays
+        return Voice(self, index, self.generations[index])
+
+    def stop_all(self):
+        for sound in self.sounds:
+            sound.stop()
+
+
+class AudioVoices:
+    """
+    Process-wide audio: one VoicePool per clip, so hundreds of tanks and landmines share a few loaded sounds
+    instead of owning an Audio each. With null set nothing is loaded or played, for the headless matches.
+    """
+    def __init__(self):
+        self.pools = {}  # path -> VoicePool
+        self.null = False
+
+    def pool(self, path, max_voices=MAX_VOICES, volume=1.0):
+        """The pool of the clip, the first call for a clip decides its voice count and volume"""
+        pool = self.pools.get(path)
+        if pool is None:
+            pool = self.pools[path] = VoicePool(self, path, max_voices, volume)
+        return pool
+
+    def play(self, path, priority=PRIORITY_NORMAL, volume=1.0, loop=False):
+        return self.pool(path).play(priority, volume, loop)
+
+    @staticmethod
+    def load_sound(path):
+        return ShowBaseGlobal.base.loader.loadSfx(Filename.fromOsSpecific(str(application.asset_folder / path)))
+
+    def stop_all(self):
+        for pool in self.pools.values():
+            pool.stop_all()
+
+    def stats(self):
+        return {
+            'clips': len(self.pools),
+            'voices': sum(len(pool.sounds) for pool in self.pools.values()),
+            'plays': sum(pool.plays for pool in self.pools.values()),
+            'stolen': sum(pool.stolen for pool in self.pools.values()),
+            'dropped': sum(pool.dropped for pool in self.pools.values()),
+        }
+
+
+audio_voices = AudioVoices()
+
+
+if __name__ == '__main__':
+    # Sound handles and construction time of the per entity Audio objects of 50 tanks and 50 landmines against the pools
+    import time as pytime
+    from ursina import Ursina, destroy
+    app = Ursina(window_type='none', development_mode=False)
+
+    start = pytime.perf_counter()
+    handles = []
+    for _ in range(50):
+        handles += [Audio('assets/audio/shoot0.wav', autoplay=False), Audio('assets/audio/shoot1.wav', autoplay=False),
+                    Audio('assets/audio/boss.ogg', loop=True, autoplay=False)]
+        handles += [Audio('assets/audio/landmine_drop.ogg', autoplay=False),
+                    Audio('assets/audio/landmine_activation.ogg', autoplay=False),
+                    Audio('assets/audio/landmine_explosion.ogg', autoplay=False)]
+    audio_time = pytime.perf_counter() - start
+    for handle in handles:
+        destroy(handle)
+
+    start = pytime.perf_counter()
+    for _ in range(50):
+        for clip in ('shoot0.wav', 'shoot1.wav', 'landmine_drop.ogg', 'landmine_activation.ogg', 'landmine_explosion.ogg'):
+            audio_voices.play(f'assets/audio/{clip}')
+    pooled_time = pytime.perf_counter() - start
+    stats = audio_voices.stats()
+    print(f"Audio per entity: {len(handles)} sound handles in {audio_time * 1000:.1f} ms")
+    print(f"Voice pools:      {stats['voices']} sound handles, 250 plays in {pooled_time * 1000:.1f} ms, "
+          f"{stats['stolen']} stolen, {stats['dropped']} dropped")
@@ -0,0 +1,148 @@
+import math
+
+
+class SpatialHash:
+    """
+    Uniform grid that buckets entities by the cells their bounding box covers.
+    Cells are tile sized and centered on the tile centers, so a terrain tile lives in exactly one cell
+    and a collision query only has to look at the handful of cells around the queried box.
+    """
+    def __init__(self, cell_size=1):
+        self.cell_size = cell_size
+        # Entities are keyed by id() because a destroyed NodePath can't be hashed reliably anymore
+        self.cells = {}         # (cell_x, cell_y) -> {id(entity): entity}
+        self.entity_cells = {}  # id(entity) -> tuple of the cell keys the entity is stored in
+
+    @staticmethod
+    def half_extent(entity):
+        # Tanks rotate in 90 degree steps, so the longer side is used for both axes
+        return max(abs(entity.scale_x), abs(entity.scale_y)) / 2
+
+    def cell_keys(self, x, y, half_width, half_height):
+        cell_size = self.cell_size
+        min_x = math.floor((x - half_width) / cell_size + 0.5)
+        max_x = math.floor((x + half_width) / cell_size + 0.5)
+        min_y = math.floor((y - half_height) / cell_size + 0.5)
+        max_y = math.floor((y + half_height) / cell_size + 0.5)
+        return tuple((cell_x, cell_y) for cell_x in range(min_x, max_x + 1) for cell_y in range(min_y, max_y + 1))
+
+    def insert(self, entity):
+        if id(entity) in self.entity_cells:
+            self.update(entity)
+            return
+        half = self.half_extent(entity)
+        keys = self.cell_keys(entity.x, entity.y, half, half)
+        for key in keys:
+            self.cells.setdefault(key, {})[id(entity)] = entity
+        self.entity_cells[id(entity)] = keys
+
+    def update(self, entity):
+        """Moves the entity to the cells that match its current position"""
+        old_keys = self.entity_cells.get(id(entity))
+        if old_keys is None:
+            self.insert(entity)
+            return
+        half = self.half_extent(entity)
+        keys = self.cell_keys(entity.x, entity.y, half, half)
+        if keys == old_keys:
+            return
+        self._remove_from_cells(id(entity), old_keys)
+        for key in keys:
+            self.cells.setdefault(key, {})[id(entity)] = entity
+        self.entity_cells[id(entity)] = keys
+
+    def remove(self, entity):
+        keys = self.entity_cells.pop(id(entity), None)
+        if keys is not None:
+            self._remove_from_cells(id(entity), keys)
+
+    def _remove_from_cells(self, entity_id, keys):
+        for key in keys:
+            cell = self.cells.get(key)
+            if cell is None:
+                continue
+            cell.pop(entity_id, None)
+            if not cell:
+                del self.cells[key]
+
+    def query(self, x, y, half_width, half_height):
+        """Returns the entities stored in the cells overlapped by the box (broad phase only)"""
+        found = {}
+        for key in self.cell_keys(x, y, half_width, half_height):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        return list(found.values())
+
+    def clear(self):
+        self.cells.clear()
+        self.entity_cells.clear()
+
+    def __len__(self):
+        return len(self.entity_cells)
+
+
+if __name__ == '__main__':
+    # Benchmark: one frame of Game.get_collided_entities_at_position for every NPC tank on level 1,
+    # against the scan of scene.entities it replaced
+    import random
+    import time as pytime
+    from src.simulator import start_headless_app
+    start_headless_app()
+    from ursina import scene
+    from src.game import Game
+
+    game = Game(headless=True)
+    game.save_file_path = 'headless'
+    game._initialize(0)
+
+    def scan(entity, position):
+        """The query before the spatial hash"""
+        collided_entities = []
+        original_position = entity.position
+        entity.position = position
+        for e in scene.entities:
+            if entity != e and e.collider:
+                if entity.intersects(e).hit:
+                    collided_entities.append(e)
+        entity.position = original_position
+        return collided_entities
+
+    tanks = []
+    frames = 5
+    print(f"{'tanks':>6} {'scan ms/frame':>14} {'hash ms/frame':>14} {'scan us/query':>14} {'hash us/query':>14} "
+          f"{'scan tests':>11} {'hash tests':>11}")
+    for npc_count in (5, 10, 20, 40, 80, 160):
+        while len(tanks) < npc_count:
+            tank = game.npc_spawner.create_npc()
+            tank.enable()
+            tank.position = (random.uniform(-9, 9), random.uniform(-6, 6))
+            game.register_entity(tank)
+            tanks.append(tank)
+        moves = [(tank, tank.position + (0.05, 0, 0)) for tank in tanks]
+        # intersects() tests per query, the hash only tests the candidates of the cells around the tank
+        scan_tests = sum(1 for e in scene.entities if e.collider) - 1
+        hash_tests = 0
+        for tank, position in moves:
+            half = SpatialHash.half_extent(tank)
+            hash_tests += sum(1 for e in game.spatial_hash.query(position[0], position[1], half, half) if e is not tank)
+
+        start = pytime.perf_counter()
+        for _ in range(frames):
+            for tank, position in moves:
+                scan(tank, position)
+        scan_time = (pytime.perf_counter() - start) / frames
+
+        start = pytime.perf_counter()
+        for _ in range(frames):
+            for tank, position in moves:
+                game.get_collided_entities_at_position(tank, position)
+        hash_time = (pytime.perf_counter() - start) / frames
+
+        print(f"{npc_count:>6} {scan_time * 1000:>14.3f} {hash_time * 1000:>14.3f} "
+              f"{scan_time / npc_count * 1e6:>14.1f} {hash_time / npc_count * 1e6:>14.1f} "
+              f"{scan_tests:>11} {hash_tests / npc_count:>11.1f}")
+    print("The frame cost doesn't stay flat with either. Every tank queries once per frame, and the hash query "
+          "grows too: the tanks crowd the fixed arena, so more of them share each other's cells, and every hit "
+          "makes Ursina's intersects() walk all of scene.entities. The hash only removes the tests of the far "
+          "away colliders, the frame is about 3 to 6 times cheaper than with the scan.")
@@ -1,50 +1,121 @@
 import os
-import time as pytime
 from collections import deque
+from typing import NamedTuple
 from ursina import *
+from src.misc.texturecache import texture_cache
+from src.misc.atlas import texture_atlas, show_region
 
 def wait(duration):
-    """Coroutine function to wait for a specified duration."""
-    start_time = pytime.time()
-    while pytime.time() - start_time < duration:
-        yield  # Yield control back to the coroutine manager.
+    """Coroutine function to wait until the time deltas sent to it add up to the duration."""
+    elapsed = 0
+    while elapsed < duration:
+        elapsed += yield  # Yield control back to the coroutine manager.
+
+class SpriteClip(NamedTuple):
+    """Frames of an animation and the delay between them, shared read-only by all the animators playing it"""
+    frames_dir: str
+    frames: tuple
+    delay: float
+    regions: tuple  # Atlas region per frame, None for a frame with its own texture
+
+
+class SpriteClipRegistry:
+    """
+    Process-wide registry of the animation clips. A clip is read from its folder on the first acquire(),
+    the animators share it after that. Clips nobody holds stay until evict_unused(), which also hands their
+    frame textures back to the texture cache.
+    """
+    def __init__(self):
+        self.clips = {}       # (folder, delay) -> SpriteClip
+        self.references = {}  # (folder, delay) -> number of animators
+        self.loads = 0
+
+    @staticmethod
+    def key(frames_dir, delay):
+        return os.path.normpath(frames_dir), delay
+
+    def acquire(self, frames_dir, delay=0.1):
+        key = self.key(frames_dir, delay)
+        clip = self.clips.get(key)
+        if clip is None:
+            clip = self.clips[key] = self._load(key[0], delay)
+            self.references[key] = 0
+        self.references[key] += 1
+        return clip
+
+    def release(self, clip):
+        key = self.key(clip.frames_dir, clip.delay)
+        if self.references.get(key, 0) > 0:
+            self.references[key] -= 1
+
+    def _load(self, frames_dir, delay):
+        # The frames are numbered files, 0.png, 1.png, ...
+        names = sorted((f for f in os.listdir(frames_dir) if os.path.isfile(os.path.join(frames_dir, f))),
+                       key=lambda f: int(f.split('.')[0]))
+        self.loads += 1
+        frames, regions = zip(*(texture_atlas.lookup(os.path.join(frames_dir, f)) for f in names))
+        return SpriteClip(frames_dir, frames, delay, regions)
+
+    def evict_unused(self):
+        """Drops the clips no animator uses anymore. Returns their count"""
+        unused = [key for key, references in self.references.items() if references == 0]
+        for key in unused:
+            clip = self.clips.pop(key)
+            del self.references[key]
+            for frame, region in zip(clip.frames, clip.regions):
+                if region is None:  # The atlas pages stay loaded
+                    texture_cache.release(str(frame.path))
+        return len(unused)
+
+
+sprite_clips = SpriteClipRegistry()
+
 
 class SpriteAnimator:
     def __init__(self, frames_dir, delay=0.1):
-        # Load textures from the specified directory.
-        self.frames = [
-            texture for texture in 
-            (load_texture(os.path.join(frames_dir, f.split('.')[0]))
-            for f in os.listdir(frames_dir)
-            if os.path.isfile(os.path.join(frames_dir, f)))
-            if texture is not None
-        ]
-        self.frames.sort(key=lambda x: int(x.name.split('.')[0]))
+        self.clip = sprite_clips.acquire(frames_dir, delay)  # Only the first animator of a clip reads the files
+        self.frames = self.clip.frames
+        self.regions = self.clip.regions
         self.delay = delay
         self.active_coroutines = deque()  # Use deque for efficient coroutine management.
 
+    def release(self):
+        """Called when the owner is destroyed, the clip can be evicted once no animator holds it"""
+        if self.clip is not None:
+            sprite_clips.release(self.clip)
+            self.clip = None
+
     def animate(self, entity, callback=None):
         """Start animation for the given entity."""
         entity._original_z = entity.z
         entity.z = -0.1
         entity.render_queue = 2
         def run_animation():
-            for frame in self.frames:
-                entity.texture = frame  # Update texture
+            for frame, region in zip(self.frames, self.regions):
+                if entity.texture is not frame:
+                    entity.texture = frame  # Update texture
+                if region is not None:
+                    show_region(entity, region)  # Frames from one atlas page only move the UVs
                 yield from wait(self.delay)  # Wait for the delay duration.
             # Wait extra time after animation finishes
             yield from wait(0.1)
+            if any(self.regions):
+                show_region(entity, None)  # A respawned tank shows its whole texture again
             if callable(callback):
                 callback()
 
-        self.active_coroutines.append(run_animation())
+        coroutine = run_animation()
+        next(coroutine)  # Shows the first frame and primes the coroutine for the time deltas
+        self.active_coroutines.append(coroutine)
 
-    def update(self):
-        """Update all active coroutines."""
+    def update(self, dt=None):
+        """Update all active coroutines. The simulation passes its tick time, otherwise the frame time is used."""
+        if dt is None:
+            dt = time.dt
         for _ in range(len(self.active_coroutines)):
             coroutine = self.active_coroutines.popleft()
             try:
-                next(coroutine)
+                coroutine.send(dt)
                 # Put it back in the queue if still active.
                 self.active_coroutines.append(coroutine)  
             except StopIteration:
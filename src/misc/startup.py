@@ -0,0 +1,120 @@
+"""
+Startup profiler: wall time of the import and init phases of main.py, up to the first rendered frame of the main menu.
+Only the standard library is imported here, so main.py can import it before anything else.
+
+    TANKSMENTAL_STARTUP_PROFILE=1 python main.py    prints the phases once the main menu is on screen
+    python -m src.misc.startup [--runs 5]            launches main.py offscreen and reports the median of the runs
+"""
+import json
+import os
+import time as pytime
+from contextlib import contextmanager
+
+PROFILE_VARIABLE = 'TANKSMENTAL_STARTUP_PROFILE'
+BENCHMARK_MODE = 'benchmark'  # The variable's value when launched by the benchmark: offscreen, JSON report, then exit
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.launch = pytime.perf_counter()
+        self.mode = os.environ.get(PROFILE_VARIABLE)
+        self.phases = []  # (name, depth, start, end), in the order they started
+        self.first_frame = None
+        self._depth = 0
+
+    @property
+    def enabled(self):
+        return bool(self.mode)
+
+    @contextmanager
+    def phase(self, name):
+        entry = [name, self._depth, pytime.perf_counter() - self.launch, None]
+        self.phases.append(entry)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            entry[3] = pytime.perf_counter() - self.launch
+
+    def app_options(self):
+        """Ursina() arguments, the benchmark runs without a screen"""
+        return {'window_type': 'offscreen'} if self.mode == BENCHMARK_MODE else {}
+
+    def watch_first_frame(self):
+        """Records when the first frame has been rendered, the report follows if profiling is on"""
+        from direct.showbase import ShowBaseGlobal
+        frames = []
+
+        def count_frame(task):
+            # The task runs at the start of a frame, the second run means the first frame is on screen
+            frames.append(pytime.perf_counter())
+            if len(frames) < 2:
+                return task.cont
+            self.first_frame = frames[-1] - self.launch
+            self._finish()
+            return task.done
+
+        ShowBaseGlobal.base.taskMgr.add(count_frame, 'startup_first_frame')
+
+    @staticmethod
+    def after_first_frame(callback):
+        """Calls back once the first frame is on screen, for the startup work the main menu can show without"""
+        from direct.showbase import ShowBaseGlobal
+
+        def wait(task):
+            if task.frame < 2:  # Frames since the task was added, the second one starts after the first was rendered
+                return task.cont
+            callback()
+            return task.done
+
+        ShowBaseGlobal.base.taskMgr.add(wait, 'startup_after_first_frame')
+
+    def _finish(self):
+        if self.mode == BENCHMARK_MODE:
+            print('STARTUP ' + json.dumps(self.summary()), flush=True)
+            os._exit(0)
+        elif self.enabled:
+            print(self.report())
+
+    def summary(self):
+        phases = {}
+        for name, depth, start, end in self.phases:
+            phases[name] = (end or 0) - start
+        return {'phases': phases, 'first_frame': self.first_frame}
+
+    def report(self):
+        lines = ['Startup profile']
+        for name, depth, start, end in self.phases:
+            lines.append(f"{'  ' * (depth + 1)}{name:<{40 - 2 * depth}} {((end or start) - start) * 1000:8.1f} ms"
+                         f"   (at {start * 1000:.0f} ms)")
+        if self.first_frame is not None:
+            lines.append(f"  {'first main menu frame':<40} at {self.first_frame * 1000:.0f} ms")
+        return '\n'.join(lines)
+
+
+startup = StartupProfiler()
+
+
+if __name__ == '__main__':
+    import argparse
+    import statistics
+    import subprocess
+    import sys
+    parser = argparse.ArgumentParser(description='Measures the time from launching main.py to its first main menu frame')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, 'main.py'], env={**os.environ, PROFILE_VARIABLE: BENCHMARK_MODE},
+                                capture_output=True, text=True, timeout=120).stdout
+        lines = [line for line in output.splitlines() if line.startswith('STARTUP ')]
+        if not lines:
+            sys.exit(f"main.py didn't report its startup:\n{output[-2000:]}")
+        results.append(json.loads(lines[-1][len('STARTUP '):]))
+
+    print(f"Median of {args.runs} launches")
+    for name in results[0]['phases']:
+        print(f"  {name:<40} {statistics.median(result['phases'][name] for result in results) * 1000:8.1f} ms")
+    print(f"  {'first main menu frame':<40} {statistics.median(result['first_frame'] for result in results) * 1000:8.1f} ms")
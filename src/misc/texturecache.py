@@ -0,0 +1,191 @@
+import hashlib
+import os
+from ursina import Texture
+from panda3d.core import TexturePool
+
+DERIVED_FOLDER = '.cache'  # Next to the source image
+
+
+class TextureCache:
+    """
+    Process-wide cache of the textures loaded from image files, keyed by the normalized path and the filtering.
+    Every user acquires a texture and releases it when done, the unreferenced textures stay cached until
+    evict_unused() is called, so a level change reuses the tileset images both levels share.
+    """
+    def __init__(self):
+        self.textures = {}   # (path, filtering) -> Texture
+        self.references = {} # (path, filtering) -> number of users
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.derived_textures = {}  # (path, transform) -> Texture, kept for the whole run
+        self.derived_builds = 0
+        self._paths = {}  # path as given -> normalized path
+
+    def key(self, path, filtering='default'):
+        normalized = self._paths.get(path)
+        if normalized is None:
+            normalized = self._paths[path] = os.path.normcase(os.path.abspath(path))
+        return normalized, filtering
+
+    def acquire(self, path, filtering='default'):
+        key = self.key(path, filtering)
+        texture = self.textures.get(key)
+        if texture is None:
+            self.misses += 1
+            texture = Texture(path, filtering)
+            self.textures[key] = texture
+            self.references[key] = 0
+        else:
+            self.hits += 1
+        self.references[key] += 1
+        return texture
+
+    def release(self, path, filtering='default'):
+        key = self.key(path, filtering)
+        if self.references.get(key, 0) > 0:
+            self.references[key] -= 1
+
+    def evict_unused(self):
+        """Drops the textures nobody uses anymore, also from the Panda3D texture pool. Returns their count"""
+        unused = [key for key, references in self.references.items() if references == 0]
+        for key in unused:
+            texture = self.textures.pop(key)
+            del self.references[key]
+            TexturePool.releaseTexture(texture._texture)
+        self.evictions += len(unused)
+        return len(unused)
+
+    @staticmethod
+    def transform_name(downscale=1, tint=None):
+        name = f"d{downscale}"
+        if tint is not None:
+            name += "-t" + "_".join(str(int(channel)) for channel in tint)
+        return name
+
+    def derived(self, path, downscale=1, tint=None, filtering='default'):
+        """
+        A texture made from the image at path, downscaled by an integer factor and multiplied by an RGBA tint
+        (0-255). It's made once per run and shared by every caller, the result is also written next to the source
+        as .cache/<name>-<source hash>-<transform>.png so the next start skips the resampling.
+        """
+        transform = self.transform_name(downscale, tint)
+        key = (self.key(path)[0], transform, filtering)
+        texture = self.derived_textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            return texture
+        self.misses += 1
+        with open(path, 'rb') as file:
+            source_hash = hashlib.sha1(file.read()).hexdigest()[:16]
+        folder, name = os.path.split(path)
+        cached_file = os.path.join(folder, DERIVED_FOLDER, f"{os.path.splitext(name)[0]}-{source_hash}-{transform}.png")
+        if not os.path.exists(cached_file):
+            image = self._derive_image(path, downscale, tint)
+            try:
+                os.makedirs(os.path.dirname(cached_file), exist_ok=True)
+                temporary = cached_file + '.tmp.png'
+                image.save(temporary)
+                os.replace(temporary, cached_file)
+            except OSError:
+                # A read-only assets folder, the image is derived again on every start
+                texture = self.derived_textures[key] = Texture(image, filtering)
+                self.derived_builds += 1
+                return texture
+            self.derived_builds += 1
+        texture = self.derived_textures[key] = Texture(cached_file, filtering)
+        return texture
+
+    @staticmethod
+    def _derive_image(path, downscale, tint):
+        from PIL import Image
+        image = Image.open(path).convert('RGBA')
+        if downscale != 1:
+            image = image.resize((max(1, image.width // downscale), max(1, image.height // downscale)), Image.LANCZOS)
+        if tint is not None:
+            image = Image.merge('RGBA', [band.point(lambda value, factor=channel / 255: round(value * factor))
+                                         for band, channel in zip(image.split(), tint)])
+        return image
+
+    @staticmethod
+    def texture_bytes(texture):
+        """Estimated memory of the texture as RGBA with its mipmap chain"""
+        size = texture.width * texture.height * 4
+        return size * 4 // 3 if texture.filtering == 'mipmap' else size
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'textures': len(self.textures),
+            'in_use': sum(1 for references in self.references.values() if references),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0,
+            'evictions': self.evictions,
+            'derived': len(self.derived_textures),
+            'derived_builds': self.derived_builds,
+            'bytes': sum(self.texture_bytes(texture) for texture in self.textures.values()),
+        }
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+
+texture_cache = TextureCache()
+
+
+if __name__ == '__main__':
+    # Load time and texture memory of the tiles of all the shipped levels, one Texture per tile against the cache
+    import glob
+    import time as pytime
+    import pytmx
+    from panda3d.core import loadPrcFileData
+    loadPrcFileData('', 'audio-library-name null')
+    from ursina import Ursina
+    app = Ursina(window_type='none', development_mode=False)
+
+    level_files = sorted(glob.glob('assets/levels/level*.tmx'))
+    levels = []
+    for tmx_file in level_files:
+        tmx_data = pytmx.TiledMap(tmx_file)
+        levels.append([image for layer in tmx_data.visible_layers if isinstance(layer, pytmx.TiledTileLayer)
+                       for _, _, gid in layer for image in [tmx_data.get_tile_image_by_gid(gid)] if image])
+
+    start = pytime.perf_counter()
+    per_tile = [[Texture(image[0], 'mipmap') for image in tiles] for tiles in levels]
+    uncached_time = pytime.perf_counter() - start
+    wrappers = sum(len(textures) for textures in per_tile)
+    pooled = len({texture._texture.getFullpath().getFullpath() for textures in per_tile for texture in textures})
+    for textures in per_tile:
+        for texture in textures:
+            TexturePool.releaseTexture(texture._texture)
+
+    cache = TextureCache()
+    start = pytime.perf_counter()
+    for tiles in levels:
+        for image in tiles:
+            cache.acquire(image[0], 'mipmap')
+        for image in tiles:
+            cache.release(image[0], 'mipmap')  # The level is left, the next one reuses what it shares
+    cached_time = pytime.perf_counter() - start
+    stats = cache.stats()
+    print(f"{len(levels)} levels, {wrappers} tiles")
+    print(f"Texture per tile: {uncached_time * 1000:.1f} ms, {wrappers} Texture objects over {pooled} pooled images")
+    print(f"Texture cache:    {cached_time * 1000:.1f} ms, {stats['textures']} textures, {stats['bytes'] / 2 ** 20:.2f} MiB, "
+          f"{stats['hits']} hits, {stats['misses']} misses")
+    print(f"Evicted after the last level: {cache.evict_unused()}")
+
+    # The bullet textures every tank used to resample on its own against the shared derived ones
+    from PIL import Image
+    start = pytime.perf_counter()
+    for _ in range(20):
+        for bullet in ('assets/images/bullet0.png', 'assets/images/bullet1.png'):
+            image = Image.open(bullet)
+            Texture(image.resize((image.width // 5, image.height // 5), Image.LANCZOS))
+    resampled_time = (pytime.perf_counter() - start) / 20
+    start = pytime.perf_counter()
+    for _ in range(20):
+        for bullet in ('assets/images/bullet0.png', 'assets/images/bullet1.png'):
+            cache.derived(bullet, downscale=5)
+    derived_time = (pytime.perf_counter() - start) / 20
+    print(f"Bullet textures per tank: resampled {resampled_time * 1000:.2f} ms -> derived {derived_time * 1000:.3f} ms")
@@ -11,11 +11,11 @@ class Timer:
         self.is_on = False
         self.effect = 0
 
-    def update(self):
+    def update(self, dt):
         if not self.is_on:
             return
         
-        self.timer += time.dt
+        self.timer += dt
         if self.timeout < self.timer:
             self.tick_callback(self.effect)
             self.ticks_count += 1
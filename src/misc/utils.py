@@ -87,6 +87,8 @@ def get_files_in_folder(folder_path: str):
         list: A list of tuples [(file_name, full_path), ...].
     """
     file_list = []
+    if not os.path.isdir(folder_path):
+        return file_list  # e.g. no games saved yet
 
     # Iterate through all files in the folder
     for file in os.listdir(folder_path):
@@ -5,42 +5,53 @@ from src.enums import EntityType
 from src.iq import *
 
 class EnemyTank(Tank):
-    def __init__(self, game, **kwargs):
+    def __init__(self, game, mission=NPCMissionType.FIND_AND_DESTROY_PLAYER, **kwargs):
         super().__init__(game, **kwargs)
         self.game = game
         self.least_interval_between_bullets = 0.2
         self.bullet_interval_counter = 0
-        self.npc_config = NPCIqConfig(NPCMissionType.FIND_AND_DESTROY_PLAYER, NPCBehaviour.SHOOT_DEFAULT_BULLET, visibility=180, distance=10)
+        self.npc_config = NPCIqConfig(mission, NPCBehaviour.SHOOT_DEFAULT_BULLET, visibility=180, distance=10)
         self.npc_iq = NPCIntelligence(self, self.npc_config)
         self.direction_vector = Vec3(0, -1, 0) # Pointing down
 
-    def update(self):
+    def think(self, elapsed):
+        """Decides the direction, called by the AI scheduler. elapsed is the simulation time since the last think"""
+        self.direction_vector = self.npc_iq.get_direction(elapsed)
+
+    def tick(self, dt):
         if self.game.paused:
             return
 
+        # Attempt to move the tank in its current direction, the direction is kept between the thinks
+        step_limit = self.npc_iq.step_limit
+        self.move(self.direction_vector, dt, step_limit)
+        if step_limit is not None:
+            # A centering step must not overshoot if the next think is a few ticks away
+            self.npc_iq.step_limit = max(0, step_limit - dt * self.speed)
 
-        self.direction_vector = self.npc_iq.get_direction()
-
-        # Attempt to move the tank in its current direction
-        self.move(self.direction_vector)
-
-        self.bullet_interval_counter += time.dt
+        self.bullet_interval_counter += dt
 
         if (self.bullet_interval_counter > self.least_interval_between_bullets 
-            and not self.is_exploded):                
-            self.ammunition.shoot_bullet(False)
+            and not self.is_exploded):
+            # Only shoot when the bullet can hit something worth it, see FIRE_POLICIES
+            bullet_index = self.game.fire_control.decide(self)
+            if bullet_index is not None:
+                if bullet_index >= 0 and bullet_index != self.ammunition.chosen_bullet_index:
+                    self.ammunition.choose_bullet_pool(bullet_index)
+                self.ammunition.shoot_bullet(False)
             self.bullet_interval_counter = 0
             self.health_bar.update_health(self.health)
 
-        super().update()
+        super().tick(dt)
 
 class NpcSpawner:
     def __init__(self, game):
         self.game = game
         self.load_level_npcs(self.game.level_index)
 
-    def load_level_npcs(self, level):
-        self.npc_pools = load_npcs(level)
+    def load_level_npcs(self, level, npc_pools=None):
+        self.npc_pools = npc_pools if npc_pools is not None else load_npcs(level)
+        self.game.squad_planner.reset()
         self.spawned_count = 0
         self.npc_pool_index = 0
         self.npcs_on_battlefield = 0
@@ -58,6 +69,11 @@ class NpcSpawner:
         return True
 
     def spawn_initial_npcs(self):
+        for _ in self.initial_spawns():
+            pass
+
+    def initial_spawns(self):
+        """Spawns the first wave one tank per step, so the LevelPreloader can spread it over frames"""
         if not self.__load_npc_pool(self.npc_pool_index):
             return
 
@@ -69,6 +85,7 @@ class NpcSpawner:
                 self.spawned_count += 1
                 self.npcs_on_battlefield += 1
                 self.npcs_available -= 1
+                yield enemy_tank
 
                 if self.npcs_available == 0:  # NPC pool is empty
                     self.npc_pool_index += 1
@@ -101,6 +118,7 @@ class NpcSpawner:
                 name=f'EnemyTank{self.spawned_count}',
                 entity_type=self.npc_pool['entity_type'],
                 game=self.game,
+                mission=self.npc_pool.get('mission', NPCMissionType.FIND_AND_DESTROY_PLAYER),
                 max_durability=self.npc_pool['max_durability'],
                 model='quad',
                 texture=self.npc_pool['texture'],
@@ -122,5 +140,6 @@ class NpcSpawner:
         enemy_tank.ammunition.choose_bullet_pool(self.npc_pool['chosen_bullet'])
         enemy_tank.ammunition.bullet_pool.max_bullets = self.npc_pool['max_bullets']
         enemy_tank.on_destroy=self.level_complete if enemy_tank.entity_type==EntityType.BOSS else self.spawn_more
+        self.game.squad_planner.enlist(enemy_tank, wave=self.npc_pool_index)  # The squads of a wave share the planning
 
         return enemy_tank
\ No newline at end of file
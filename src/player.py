@@ -1,6 +1,7 @@
 from ursina import *
 from src.widgetry.healthbar import HealthBar
 from src.tank import Tank
+from src.misc.audiopool import audio_voices, NULL_VOICE, PRIORITY_HIGH
 from src.controller import BaseController
 from src.enums import EntityType
 from src.widgetry.bars import LandmineBar, BuildingBlockBar
@@ -21,7 +22,7 @@ class Player(Tank):
         self.last_deployable_switch = 0
         self.pause_allowed = True
         self.landmine_drop_allowed = True
-        self.move_audio = Audio("assets/audio/tank_move.ogg", volume=1, loop=True, autoplay=False)
+        self.move_audio = NULL_VOICE  # The engine loop while the tank moves
         self.prepare_stats()
 
     def respawn(self):
@@ -46,6 +47,7 @@ class Player(Tank):
         invoke(self.enable, delay=0.01)  # Small delay ensures proper reprocessing
 
     def update(self):
+        """Pause and level transitions are handled every frame, the gameplay runs in tick"""
         if self.game.over:
             return
         if self.controller.controllers_count <= self.controller_id:
@@ -65,24 +67,28 @@ class Player(Tank):
                 destroy(self.game.background)
                 destroy(self.game.level_completed_text)
                 destroy(self.game.press_key_text)
-                self.game.destroy_terrain_elements()
                 self.game.level_index += 1
                 if self.game.level_index >= self.game.levels_count:
+                    self.game.destroy_terrain_elements()
                     self.game.show_you_win()
                     return
-                self.game.create_tile_map()
-                self.game.npc_spawner.load_level_npcs(self.game.level_index)
-                self.game.npc_spawner.spawn_initial_npcs()
+                # Swaps in the level prepared behind the level complete screen, the first wave follows over a few frames
+                self.game.level_preloader.activate(self.game.level_index)
                 for player in self.game.players:
                     tmp = player.health
                     player.respawn()
                     player.durability = tmp
 
                 self.game.level_complete = False
-                
+
+    def tick(self, dt):
+        if self.game.over or self.game.paused or self.game.level_complete:
             return
-        
-        super().update()
+        if self.controller.controllers_count <= self.controller_id:
+            return # There is no controller connected for this player
+        buttons_state = self.controller.get_buttons_state(self.controller_id)
+
+        super().tick(dt)
 
         if self.is_exploded:
             return
@@ -102,8 +108,8 @@ class Player(Tank):
         
         if direction != "":
             if not self.move_audio.playing:
-                self.move_audio.play()
-            self.move(self.game.directions[direction])             
+                self.move_audio = audio_voices.play("assets/audio/tank_move.ogg", priority=PRIORITY_HIGH, loop=True)
+            self.move(self.game.directions[direction], dt)             
 
         if buttons_state['shoot'] and self.can_shoot:
             self.ammunition.shoot_bullet(play_sound=True)
@@ -117,12 +123,12 @@ class Player(Tank):
         elif not buttons_state['drop'] and not self.landmine_drop_allowed:
             self.landmine_drop_allowed = True
 
-        self.last_bullet_switch += time.dt
+        self.last_bullet_switch += dt
         if buttons_state['next_bullet'] and self.last_bullet_switch > self.switch_speed:
             self.ammunition.next_bullet_variant()
             self.last_bullet_switch = 0
 
-        self.last_deployable_switch += time.dt
+        self.last_deployable_switch += dt
         if buttons_state['previous_bullet'] and self.last_deployable_switch > self.switch_speed:
             self.ammunition.next_deployable()
             self.last_deployable_switch = 0
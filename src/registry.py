@@ -0,0 +1,72 @@
+from src.enums import CollisionEffect, EntityType
+
+TANK_TYPES = (EntityType.PLAYER_TANK, EntityType.ENEMY_TANK, EntityType.BOSS)
+NPC_TYPES = (EntityType.ENEMY_TANK, EntityType.BOSS)
+TERRAIN_TYPES = (EntityType.TERRAIN, EntityType.BASE)
+
+
+class EntityRegistry:
+    """
+    Live sets of the game entities by EntityType and, for the terrain, by CollisionEffect.
+    Updated when entities are created and destroyed, so lookups cost O(result) and never walk the scene.
+    """
+    def __init__(self):
+        # Dicts keyed by id(entity) work as insertion ordered sets
+        self.by_type = {entity_type: {} for entity_type in EntityType}
+        self.by_effect = {collision_effect: {} for collision_effect in CollisionEffect}
+        self._registered = {}  # id(entity) -> (entity_type, collision_effect) it was filed under
+
+    def add(self, entity):
+        self.remove(entity)
+        entity_type = getattr(entity, 'entity_type', None)
+        collision_effect = getattr(entity, 'collision_effect', None) if entity_type in TERRAIN_TYPES else None
+        if entity_type is not None:
+            self.by_type[entity_type][id(entity)] = entity
+        if collision_effect is not None:
+            self.by_effect[collision_effect][id(entity)] = entity
+        self._registered[id(entity)] = (entity_type, collision_effect)
+
+    def remove(self, entity):
+        registered = self._registered.pop(id(entity), None)
+        if registered is None:
+            return
+        entity_type, collision_effect = registered
+        if entity_type is not None:
+            self.by_type[entity_type].pop(id(entity), None)
+        if collision_effect is not None:
+            self.by_effect[collision_effect].pop(id(entity), None)
+
+    def __contains__(self, entity):
+        return id(entity) in self._registered
+
+    def of_type(self, *entity_types):
+        found = []
+        for entity_type in entity_types:
+            found.extend(self.by_type[entity_type].values())
+        return found
+
+    def with_effect(self, *collision_effects):
+        found = []
+        for collision_effect in collision_effects:
+            found.extend(self.by_effect[collision_effect].values())
+        return found
+
+    def barriers(self):
+        return self.with_effect(CollisionEffect.BARRIER)
+
+    def no_barriers(self):
+        return self.with_effect(*(effect for effect in CollisionEffect if effect != CollisionEffect.BARRIER))
+
+    def tanks(self):
+        return self.of_type(*TANK_TYPES)
+
+    def live_tanks(self, *entity_types):
+        """Tanks that are not exploding, all the tank types if none is passed"""
+        return [tank for tank in self.of_type(*(entity_types or TANK_TYPES)) if not tank.is_exploded]
+
+    def clear(self):
+        for entities in self.by_type.values():
+            entities.clear()
+        for entities in self.by_effect.values():
+            entities.clear()
+        self._registered.clear()
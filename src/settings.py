@@ -30,3 +30,10 @@ class Settings:
 
         # Objects
         self.tile_size = 1
+
+        # Gameplay
+        self.friendly_fire = False
+        self.simulation_rate = 60       # Fixed simulation ticks per second
+        self.max_catch_up_ticks = 5     # Most ticks run in one slow frame, the rest of the frame time is dropped
+        self.ai_think_budget_ms = 2     # Time the NPCs may spend thinking in one simulation tick
+        self.level_preload_budget_ms = 4  # Frame time spent on building the next level behind the level complete screen
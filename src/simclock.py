@@ -0,0 +1,93 @@
+from ursina import Entity, time
+
+
+class SimulationClock(Entity):
+    """
+    Fixed-timestep clock of the gameplay simulation. The frame time is collected in an accumulator and the
+    game is advanced in ticks of exactly tick_dt, so the movement, the timers and the AI don't depend on the frame rate.
+    A slow frame runs at most max_catch_up ticks, the rest of its time is dropped instead of freezing the game.
+    Between the ticks the rendered tank positions are interpolated, the simulation always sees the exact tick positions.
+    """
+    def __init__(self, game, tick_rate=60, max_catch_up=5, **kwargs):
+        super().__init__(name='simulation_clock', **kwargs)
+        self.game = game
+        self.tick_rate = tick_rate
+        self.tick_dt = 1 / tick_rate
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0
+        self.alpha = 0          # Progress of the rendering between the last two ticks, from 0 to 1
+        self.ticks = 0          # Ticks since the start
+        self.dropped_time = 0   # Frame time skipped because the catch-up limit was hit
+        self.time_scale = 1     # Above 1 the simulation runs faster than real time
+        self._interpolated = {} # id(entity) -> [entity, previous tick position, last tick position, rendered position]
+
+    def tick(self):
+        """Advances the whole simulation by one fixed step"""
+        self._restore_positions()
+        self.game.tick(self.tick_dt)
+        self._store_positions()
+        self.ticks += 1
+
+    def run(self, ticks):
+        """Runs the ticks right away, without waiting for the frames. Used when no window is needed"""
+        for _ in range(ticks):
+            self.tick()
+        self.alpha = 1
+        self._interpolate()
+
+    def reset(self):
+        self.accumulator = 0
+        self.alpha = 0
+        self._interpolated.clear()
+
+    def _restore_positions(self):
+        """Puts the interpolated entities back to their last tick positions before the simulation reads them"""
+        registry = self.game.registry
+        for interpolated in self._interpolated.values():
+            entity, previous, current, rendered = interpolated
+            if entity not in registry:
+                continue
+            if entity.position != rendered:
+                # Moved outside of the ticks (spawn, respawn, level load), that's a teleport and it's kept as is
+                interpolated[1] = interpolated[2] = entity.position
+            elif rendered != current:
+                entity.position = current
+
+    def _store_positions(self):
+        interpolated = {}
+        for entity in self.game.registry.tanks():
+            position = entity.position
+            known = self._interpolated.get(id(entity))
+            if known is not None and known[0] is entity:
+                interpolated[id(entity)] = [entity, known[2], position, position]
+            else:
+                interpolated[id(entity)] = [entity, position, position, position]
+        self._interpolated = interpolated
+
+    def _interpolate(self):
+        registry = self.game.registry
+        for interpolated in self._interpolated.values():
+            entity, previous, current, rendered = interpolated
+            if entity not in registry:
+                continue
+            if entity.position != rendered:
+                # Teleported since the last tick, there is nothing to interpolate from
+                interpolated[1] = interpolated[2] = entity.position
+            elif previous != current:
+                entity.position = previous + (current - previous) * self.alpha
+            interpolated[3] = entity.position
+        self.game.projectiles.interpolate(self.alpha)
+
+    def update(self):
+        if self.game.paused:
+            return
+        self.accumulator += time.dt * self.time_scale
+        max_accumulated = self.tick_dt * self.max_catch_up
+        if self.accumulator > max_accumulated:
+            self.dropped_time += self.accumulator - max_accumulated
+            self.accumulator = max_accumulated
+        while self.accumulator >= self.tick_dt:
+            self.tick()
+            self.accumulator -= self.tick_dt
+        self.alpha = self.accumulator / self.tick_dt
+        self._interpolate()
@@ -0,0 +1,173 @@
+"""
+Headless matches: a level of levels.npcs played by scripted or bot players with no window and no audio.
+Many matches run in parallel, each one in its own worker process, for balancing the NPC waves
+and for catching performance regressions.
+
+    python -m src.simulator --levels 1 2 --matches 4 --players 2 --controller ai --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time as pytime
+
+# Game seconds a match may last before it's called a timeout
+DEFAULT_MATCH_SECONDS = 300
+OUTCOMES = ('won', 'lost', 'timeout')
+
+_app = None
+
+
+def start_headless_app():
+    """One Ursina app per process, without a window and with the null audio device"""
+    global _app
+    if _app is None:
+        from panda3d.core import loadPrcFileData
+        loadPrcFileData('', 'audio-library-name null')
+        from pathlib import Path
+        from ursina import Ursina, application
+        import ursina.texture_importer as texture_importer
+        # Ursina looks for the assets next to the main script, which is src/ when run with -m
+        root = Path(__file__).resolve().parent.parent
+        texture_importer.folders[texture_importer.folders.index(application.asset_folder)] = root
+        application.asset_folder = root
+        _app = Ursina(window_type='none', development_mode=False)
+    return _app
+
+
+def idle_script(step):
+    return ()
+
+
+def patrol_script(step):
+    """Leaves the base row, then drives left and right and shoots up between the legs"""
+    if step < 45:
+        return ('up',)
+    phase = (step - 45) % 240
+    if phase < 90:
+        return ('left',) if (step - 45) % 480 < 240 else ('right',)
+    if phase < 100:
+        return ('up',)  # Turns the barrel away from the base before shooting
+    return ('shoot',) if step % 2 == 0 else ()
+
+
+SCRIPTS = {
+    'idle': idle_script,
+    'patrol': patrol_script,
+}
+
+
+def _create_controller(game, controller):
+    from src.controller import AIController, ScriptedController
+    if controller == 'ai':
+        return AIController(game)
+    return ScriptedController(SCRIPTS[controller])
+
+
+def run_match(level=0, players=1, controller='ai', max_seconds=DEFAULT_MATCH_SECONDS, seed=None, chunk_ticks=60):
+    """Plays one level until it's won, lost or the time is up. Returns the match report as a dict"""
+    start_headless_app()
+    from ursina import color
+    from src.game import Game
+    from src.character import IronGuard
+
+    if seed is not None:
+        random.seed(seed)
+    game = Game(headless=True)
+    game.save_file_path = 'headless'  # Nothing is written to saves/ when the level is completed
+    for index in range(players):
+        player_controller = _create_controller(game, controller)
+        player = game.create_player(player_controller, 0, index, IronGuard, color.white)
+        if hasattr(player_controller, 'attach'):
+            player_controller.attach(player)
+    game.level_index = level
+    game._initialize(level)
+
+    clock = game.clock
+    max_ticks = int(max_seconds * clock.tick_rate)
+    start = pytime.perf_counter()
+    while clock.ticks < max_ticks and not game.level_complete and not game.over:
+        clock.run(min(chunk_ticks, max_ticks - clock.ticks))
+    wall_time = pytime.perf_counter() - start
+
+    outcome = 'won' if game.level_complete else 'lost' if game.over else 'timeout'
+    spawner = game.npc_spawner
+    return {
+        'level': level,
+        'players': players,
+        'controller': controller,
+        'seed': seed,
+        'outcome': outcome,
+        'ticks': clock.ticks,
+        'game_seconds': clock.ticks / clock.tick_rate,
+        'wall_time': wall_time,
+        'ticks_per_second': clock.ticks / wall_time if wall_time else 0,
+        'kills': sum(player.kills for player in game.players),
+        'player_deaths': sum(player.deaths for player in game.players),
+        'npcs_spawned': spawner.spawned_count,
+        'npcs_total': spawner.total_npcs,
+        'npcs_on_battlefield': spawner.npcs_on_battlefield,
+        'damage_dealt': sum(player.total_damage_dealt for player in game.players),
+        'ai_average_think_ms': game.ai_scheduler.stats()['average_time_ms'],
+        'npc_shots': game.fire_control.shots,
+        'npc_held_shots': game.fire_control.holds,
+        'squad_plans': game.squad_planner.plans,
+    }
+
+
+def _run_match_kwargs(kwargs):
+    return run_match(**kwargs)
+
+
+def _silence_worker():
+    sys.stdout = open(os.devnull, 'w')
+
+
+def run_batch(matches, workers=None, verbose=False):
+    """
+    Runs the matches (a list of run_match keyword dicts) in a process pool. Every match gets a fresh process,
+    Ursina keeps its scene in module globals and can't host two games in one process.
+    """
+    context = multiprocessing.get_context('spawn')
+    initializer = None if verbose else _silence_worker
+    with context.Pool(processes=workers, initializer=initializer, maxtasksperchild=1) as pool:
+        return pool.map(_run_match_kwargs, matches, chunksize=1)
+
+
+def summarize(reports):
+    by_level = {}
+    for report in reports:
+        by_level.setdefault(report['level'], []).append(report)
+    lines = []
+    for level, level_reports in sorted(by_level.items()):
+        outcomes = {outcome: sum(report['outcome'] == outcome for report in level_reports) for outcome in OUTCOMES}
+        ticks_per_second = sum(report['ticks_per_second'] for report in level_reports) / len(level_reports)
+        kills = sum(report['kills'] for report in level_reports) / len(level_reports)
+        game_seconds = sum(report['game_seconds'] for report in level_reports) / len(level_reports)
+        lines.append(f"Level {level + 1}: {outcomes}, {game_seconds:.0f} game s, {kills:.1f} kills, "
+                     f"{ticks_per_second:.0f} ticks/s on average")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs headless matches in parallel')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1], help='Level numbers, starting from 1')
+    parser.add_argument('--matches', type=int, default=4, help='Matches per level')
+    parser.add_argument('--players', type=int, default=1, choices=range(1, 5))
+    parser.add_argument('--controller', default='ai', choices=['ai'] + list(SCRIPTS))
+    parser.add_argument('--seconds', type=float, default=DEFAULT_MATCH_SECONDS, help='Game time limit of a match')
+    parser.add_argument('--workers', type=int, default=None, help='Processes, all the cores by default')
+    parser.add_argument('--verbose', action='store_true', help='Keep the game log of the workers')
+    args = parser.parse_args()
+
+    matches = [dict(level=level - 1, players=args.players, controller=args.controller, max_seconds=args.seconds, seed=seed)
+               for level in args.levels for seed in range(args.matches)]
+    start = pytime.perf_counter()
+    reports = run_batch(matches, args.workers, args.verbose)
+    for report in reports:
+        print(f"Level {report['level'] + 1} seed {report['seed']}: {report['outcome']} after {report['game_seconds']:.0f} game s, "
+              f"{report['kills']} kills, {report['player_deaths']} deaths, wall {report['wall_time']:.1f} s, "
+              f"{report['ticks_per_second']:.0f} ticks/s")
+    print(summarize(reports))
+    print(f"{len(reports)} matches in {pytime.perf_counter() - start:.1f} s")
@@ -0,0 +1,146 @@
+import math
+import random
+from collections import deque
+from src.misc.spatialhash import SpatialHash
+
+
+class SpawnSlots:
+    """
+    Live index of the free spawn cells on the top row of the battlefield.
+    A cell is taken while a static barrier or any tank overlaps it. The free cells are kept in a dense list,
+    so picking a random one is O(1). Tanks that find no free cell wait in the queue until one frees up.
+    """
+    def __init__(self, game):
+        self.game = game
+        settings = game.settings
+        self.columns = list(range(settings.screen_left, settings.screen_right))
+        self.y = settings.screen_top
+        self.half_size = game.tile_size / 2
+        self.occupants = {column: set() for column in self.columns}  # column -> ids of the tanks overlapping it
+        self.tank_columns = {}  # id(tank) -> columns the tank overlaps
+        self.blocked = set()    # columns with a static barrier
+        self.free = []
+        self._free_index = {}   # column -> index in self.free
+        self._grid_key = None
+        self.queue = deque()
+        self._queued = set()    # ids of the tanks in the queue
+        for column in self.columns:
+            self._refresh(column)
+
+    def _refresh(self, column):
+        is_free = column not in self.blocked and not self.occupants[column]
+        is_listed = column in self._free_index
+        if is_free and not is_listed:
+            self._free_index[column] = len(self.free)
+            self.free.append(column)
+        elif not is_free and is_listed:
+            # Swap-remove keeps the free list dense
+            index = self._free_index.pop(column)
+            last = self.free.pop()
+            if last != column:
+                self.free[index] = last
+                self._free_index[last] = index
+
+    def _refresh_static(self):
+        grid = self.game.terrain_grid
+        key = (id(grid), grid.version)
+        if key == self._grid_key:
+            return
+        self._grid_key = key
+        self.blocked = {column for column in self.columns
+                        if grid.is_blocked(column, self.y, self.half_size, self.half_size)}
+        for column in self.columns:
+            self._refresh(column)
+
+    def _set_tank_columns(self, tank, columns):
+        old_columns = self.tank_columns.get(id(tank), ())
+        if columns == old_columns:
+            return
+        for column in old_columns:
+            self.occupants[column].discard(id(tank))
+            self._refresh(column)
+        for column in columns:
+            self.occupants[column].add(id(tank))
+            self._refresh(column)
+        if columns:
+            self.tank_columns[id(tank)] = columns
+        else:
+            self.tank_columns.pop(id(tank), None)
+
+    def update_tank(self, tank):
+        """Called whenever a tank moves, only tanks inside the spawn band take slots"""
+        half = SpatialHash.half_extent(tank)
+        reach = self.half_size + half
+        columns = ()
+        if abs(tank.y - self.y) < reach:
+            first = math.floor(tank.x - reach) + 1
+            last = math.ceil(tank.x + reach) - 1
+            columns = tuple(column for column in range(first, last + 1) if column in self.occupants)
+        self._set_tank_columns(tank, columns)
+
+    def remove_tank(self, tank):
+        self._set_tank_columns(tank, ())
+        self.dequeue(tank)
+
+    def take(self):
+        """Random free column or None if the whole spawn band is taken"""
+        self._refresh_static()
+        if not self.free:
+            return None
+        return random.choice(self.free)
+
+    def enqueue(self, tank):
+        """The game takes the tank out of the registry while it waits, spawn() puts it back"""
+        if id(tank) not in self._queued:
+            self._queued.add(id(tank))
+            self.queue.append(tank)
+
+    def dequeue(self, tank):
+        if id(tank) in self._queued:
+            self._queued.discard(id(tank))
+            self.queue.remove(tank)
+
+    def is_queued(self, tank):
+        return id(tank) in self._queued
+
+    def clear_queue(self):
+        self.queue.clear()
+        self._queued.clear()
+
+    def tick(self, dt):
+        if self.game.paused or not self.queue:
+            return
+        while self.queue and self.take() is not None:
+            tank = self.queue.popleft()
+            self._queued.discard(id(tank))
+            self.game.spawn(tank)
+
+
+if __name__ == '__main__':
+    # A tank queued for a spawn slot stays put and holds its fire until a slot frees up
+    from src.simulator import start_headless_app
+    start_headless_app()
+    from src.game import Game
+
+    game = Game(headless=True)
+    game.save_file_path = 'headless'
+    game._initialize(0)
+    slots = game.spawn_slots
+    for column in slots.columns:  # A tank that never moves on every column of the spawn band
+        slots.occupants[column].add(-1)
+        slots._refresh(column)
+    npc = game.npc_spawner.create_npc()
+    game.spawn(npc)
+    assert slots.is_queued(npc) and npc not in game.registry
+    position = npc.position
+    game.clock.run(120)
+    projectiles = game.projectiles
+    assert npc.position == position, 'a queued tank moved'
+    assert not any(projectiles.pools[i].owner is npc for i in range(projectiles.count)), 'a queued tank shot'
+
+    for column in slots.columns:
+        slots.occupants[column].discard(-1)
+        slots._refresh(column)
+    game.clock.run(1)
+    assert not slots.is_queued(npc) and npc in game.registry and npc.enabled
+    print(f"Queued tank held still for 120 ticks, then spawned at {npc.position}")
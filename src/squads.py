@@ -0,0 +1,194 @@
+import random
+from src.enums import EntityType
+from src.iq import NPCMissionType
+
+SQUAD_SIZE = 3
+PLANNING_INTERVAL = 0.5  # Seconds between two plans of a squad
+LOST_TARGET_TIMEOUT = 3  # Seconds a squad keeps chasing a target nobody sees anymore
+
+# Alignment the members take to shoot at the target, alternated over the squad so it attacks from two sides
+VERTICAL = 'vertical'      # Same column as the target, shooting up or down
+HORIZONTAL = 'horizontal'  # Same row as the target, shooting left or right
+
+
+class Squad:
+    """NPCs of one wave that share a target and a route. The members only steer locally"""
+    def __init__(self, wave, mission):
+        self.wave = wave
+        self.mission = mission
+        self.members = []
+        self.target = None
+        self.last_known_position = None
+        self.engaged = False
+        self.lost_timer = 0
+        self.route = None  # FlowField shared by the members, to the target or to the base
+        self.flanks = {}   # id(member) -> VERTICAL or HORIZONTAL
+        self.plan_timer = random.uniform(0, PLANNING_INTERVAL)  # Spreads the plans of the squads over the ticks
+
+    def centroid(self):
+        active = [member for member in self.members if member.enabled] or self.members
+        return (sum(member.x for member in active) / len(active),
+                sum(member.y for member in active) / len(active))
+
+
+class SquadPlanner:
+    """
+    Plans for the NPC squads built by the NpcSpawner. Once per squad and planning interval the planner pools
+    what the members see, picks the target, the route and the flank of every member. The NPCIntelligence of
+    a member then only follows the route or lines up on its flank, so the planning cost grows with the squads
+    instead of the tanks.
+    """
+    def __init__(self, game, squad_size=SQUAD_SIZE, planning_interval=PLANNING_INTERVAL):
+        self.game = game
+        self.squad_size = squad_size
+        self.planning_interval = planning_interval
+        self.squads = []
+        self.plans = 0  # Plans made since the last reset_stats
+
+    def reset(self):
+        for squad in self.squads:
+            for member in squad.members:
+                member.npc_iq.squad = None
+        self.squads.clear()
+
+    def enlist(self, npc, wave):
+        """Adds the NPC to the open squad of its wave and mission, a new squad is formed when there is none"""
+        mission = npc.npc_config.mission
+        for squad in self.squads:
+            if squad.wave == wave and squad.mission == mission and len(squad.members) < self.squad_size:
+                break
+        else:
+            squad = Squad(wave, mission)
+            self.squads.append(squad)
+        squad.members.append(npc)
+        npc.npc_iq.squad = squad
+        return squad
+
+    def _prune(self, squad):
+        registry = self.game.registry
+        spawn_slots = self.game.spawn_slots
+        # The members queued for a spawn slot are out of the registry until they spawn, the destroyed ones for good
+        squad.members = [member for member in squad.members
+                         if not member.is_exploded and (member in registry or spawn_slots.is_queued(member))]
+
+    def plan(self, squad, elapsed):
+        self.plans += 1
+        navigation = self.game.navigation
+        if squad.mission == NPCMissionType.DESTROY_BASE:
+            squad.route = navigation.field_to_base()
+            return
+        if squad.mission != NPCMissionType.FIND_AND_DESTROY_PLAYER:
+            return
+
+        # One look through the eyes of all the members, the vision pass of this tick is already done
+        vision = self.game.vision
+        seen = {}
+        for member in squad.members:
+            for player in vision.visible_players(member):
+                seen[id(player)] = player
+        if seen:
+            if squad.target is None or id(squad.target) not in seen:
+                x, y = squad.centroid()
+                squad.target = min(seen.values(), key=lambda player: abs(player.x - x) + abs(player.y - y))
+                print(f"Squad of wave {squad.wave} with {len(squad.members)} tanks locked onto {squad.target}")
+            squad.engaged = True
+            squad.lost_timer = 0
+            squad.last_known_position = squad.target.position
+        elif squad.engaged:
+            squad.lost_timer += elapsed
+            if squad.lost_timer >= LOST_TARGET_TIMEOUT or squad.target.is_exploded:
+                print(f"Squad of wave {squad.wave} lost track of {squad.target}, switching to wandering mode")
+                squad.target = None
+                squad.last_known_position = None
+                squad.engaged = False
+
+        if squad.engaged:
+            squad.route = navigation.field_to_player(squad.target)
+            self._assign_flanks(squad)
+        else:
+            squad.route = None
+        for member in squad.members:
+            member.npc_iq.locked_on_player = squad.engaged
+            member.npc_iq.target_player = squad.target
+
+    def _assign_flanks(self, squad):
+        """The member closest to the target takes the alignment it's nearest to, the others alternate"""
+        target = squad.target
+        members = sorted(squad.members, key=lambda member: abs(member.x - target.x) + abs(member.y - target.y))
+        squad.flanks = {}
+        if not members:
+            return
+        lead = members[0]
+        first = VERTICAL if abs(lead.x - target.x) <= abs(lead.y - target.y) else HORIZONTAL
+        second = HORIZONTAL if first == VERTICAL else VERTICAL
+        for index, member in enumerate(members):
+            squad.flanks[id(member)] = first if index % 2 == 0 else second
+
+    def tick(self, dt):
+        for squad in self.squads:
+            self._prune(squad)
+        self.squads = [squad for squad in self.squads if squad.members]
+        for squad in self.squads:
+            squad.plan_timer -= dt
+            if squad.plan_timer <= 0:
+                self.plan(squad, self.planning_interval - squad.plan_timer)
+                squad.plan_timer += self.planning_interval
+
+    def stats(self):
+        return {
+            'squads': len(self.squads),
+            'members': sum(len(squad.members) for squad in self.squads),
+            'engaged': sum(squad.engaged for squad in self.squads),
+            'plans': self.plans,
+        }
+
+    def reset_stats(self):
+        self.plans = 0
+
+
+if __name__ == '__main__':
+    # Five hunters of one wave form two squads, what one member sees the whole squad chases
+    from types import SimpleNamespace
+    from src.registry import EntityRegistry
+    from src.iq import NPCIqConfig, NPCBehaviour
+
+    class Tank(SimpleNamespace):
+        pass
+
+    player = Tank(x=0, y=-6, position=(0, -6), entity_type=EntityType.PLAYER_TANK, is_exploded=False, enabled=True)
+    npcs = []
+    for i in range(5):
+        config = NPCIqConfig(NPCMissionType.FIND_AND_DESTROY_PLAYER, NPCBehaviour.SHOOT_DEFAULT_BULLET)
+        npcs.append(Tank(x=-8 + i * 4, y=6, entity_type=EntityType.ENEMY_TANK, is_exploded=False, enabled=True,
+                         npc_config=config, npc_iq=SimpleNamespace(squad=None)))
+    registry = EntityRegistry()
+    for tank in [player] + npcs:
+        registry.add(tank)
+    vision = SimpleNamespace(visible_players=lambda npc: [player] if npc is npcs[0] else [])
+    navigation = SimpleNamespace(field_to_player=lambda target: 'field to player', field_to_base=lambda: None)
+    queued = set()
+    spawn_slots = SimpleNamespace(is_queued=lambda tank: id(tank) in queued)
+    game = SimpleNamespace(registry=registry, vision=vision, navigation=navigation, spawn_slots=spawn_slots)
+
+    planner = SquadPlanner(game)
+    for npc in npcs:
+        planner.enlist(npc, wave=0)
+    assert [len(squad.members) for squad in planner.squads] == [3, 2]
+    for _ in range(60):
+        planner.tick(1 / 60)
+    first, second = planner.squads
+    assert first.engaged and first.target is player and first.route == 'field to player'
+    assert all(npc.npc_iq.locked_on_player for npc in first.members)
+    assert not second.engaged and not any(npc.npc_iq.locked_on_player for npc in second.members)
+    assert sorted(first.flanks.values()) == [HORIZONTAL, VERTICAL, VERTICAL]
+
+    # A member waiting for a spawn slot stays in its squad, a destroyed one leaves it even if it reports disabled
+    waiting, destroyed = second.members
+    for tank in (waiting, destroyed):
+        registry.remove(tank)
+        tank.enabled = False
+    queued.add(id(waiting))
+    for _ in range(60):
+        planner.tick(1 / 60)
+    assert second.members == [waiting]
+    print(planner.stats())
@@ -7,6 +7,7 @@ from src.misc.utils import get_files_in_folder, json_load
 from src.character import IronGuard, TrailBlazer, PlayerCharacter
 from src.menu.menuentry import Menu
 from src.widgetry.effects import Outline
+from src.misc.startup import startup
 
 class StartMenuElement(Entity):
     def __init__(self, scale=(0.5, 0.5), **kwargs):
@@ -116,13 +117,25 @@ class StartMenu:
         self.ps4controller = PS4Controller()
         self.controllers = [self.keyboardcontroller, self.ps4controller]
         self.keyboardcontroller.initialize_controller()
-        self.ps4controller.initialize_controller()        
-        self.controllers_count = len(self.ps4controller.controllers)
+        self.controllers_count = 0
+        # The joysticks join right after the main menu is on screen (pygame alone takes 200 ms to import),
+        # the keyboard works from the first frame
+        startup.after_first_frame(self._initialize_joysticks)
+        # Only the main menu is built now, the other menus on their first use
+        self._continue_menu = None
+        self._settings_menu = None
+        self._controller_menu = None
+        self._pause_menu = None
+        self._game_over_menu = None
         self.init_menus()
         self.show_main_menu()
         
         #self._display_home_menu()
 
+    def _initialize_joysticks(self):
+        self.ps4controller.initialize_controller()
+        self.controllers_count = len(self.ps4controller.controllers)
+
     def init_menus(self):
         # Main Menu
         self.main_menu = Menu(
@@ -133,39 +146,6 @@ class StartMenu:
                 "Exit": self._exit,
             },
         )
-        
-        files = get_files_in_folder('saves/game')
-
-        options = []
-        for file in files:
-            file_name, _ = file
-            options.append(file_name)
-        self.continue_menu = Menu(
-            controllers=self.controllers,
-            title="Continue",
-            options=options,
-            parent_menu=self.main_menu
-        )
-
-        action_map = {}
-        for file in files:
-            file_name, file_path = file         
-            action_map[file_name] = lambda: [self.continue_menu.deactivate(), self._load_saved_game(file_path=file_path)]
-        self.continue_menu.action_map = action_map
-
-        self.settings_menu = Menu(
-            controllers=self.controllers,
-            title="Settings",
-            options=["Screen resolution", "Enable friendly fire", "Game difficulty", "Controller settings"],
-            parent_menu=self.main_menu
-        )
-
-        self.controller_menu = Menu(
-            controllers=self.controllers,
-            title="Controller Settings",
-            options=["Shoot", "Switch bullet", "Switch droppable", "Drop"],
-            parent_menu=self.settings_menu
-        )
 
         self.main_menu.action_map.update({
             "Start"   : lambda: [self.main_menu.deactivate(), self._display_setup_new_game(self)],
@@ -173,49 +153,101 @@ class StartMenu:
             "Settings": lambda: [self.main_menu.deactivate(), self.settings_menu.activate()],
         })
 
-        self.settings_menu.action_map.update({
-            "Controller settings": lambda: [self.settings_menu.deactivate(), self.controller_menu.activate()],
-        })
+    @property
+    def continue_menu(self):
+        if self._continue_menu is None:
+            files = get_files_in_folder('saves/game')  # Scanned when the menu is first opened
+
+            options = []
+            for file in files:
+                file_name, _ = file
+                options.append(file_name)
+            self._continue_menu = Menu(
+                controllers=self.controllers,
+                title="Continue",
+                options=options,
+                parent_menu=self.main_menu
+            )
+
+            action_map = {}
+            for file in files:
+                file_name, file_path = file
+                action_map[file_name] = lambda file_path=file_path: [self._continue_menu.deactivate(), self._load_saved_game(file_path=file_path)]
+            self._continue_menu.action_map = action_map
+        return self._continue_menu
 
-        # Pause menu
-        self.pause_background = Entity(model='quad', 
-                                  scale=(self.settings.horizontal_game_area + 1, self.settings.vertical_game_area + 1), 
-                                  color=color.black66,
-                                  transparent=True,
-                                  z=-0.1,
-                                  render_queue=3,
-                                  visible=False)
-        self.pause_menu = Menu(
-        controllers=self.controllers,
-        title="Game paused",
-        options=["Continue", "Restart level", "Settings", "Return to main menu"],
-        )
-            
-        self.pause_menu.action_map.update({
-            "Continue": lambda: self.game.toggle_pause(),
-            "Restart level": lambda: [self.game.toggle_pause(), self.game.restart_level()],
-            "Return to main menu": lambda: [self.hide_pause_menu(), self.game.toggle_pause(), self.game.total_cleanup(), self.show_main_menu()],
-        })
+    @property
+    def settings_menu(self):
+        if self._settings_menu is None:
+            self._settings_menu = Menu(
+                controllers=self.controllers,
+                title="Settings",
+                options=["Screen resolution", "Enable friendly fire", "Game difficulty", "Controller settings"],
+                parent_menu=self.main_menu
+            )
+
+            self._settings_menu.action_map.update({
+                "Enable friendly fire": self._toggle_friendly_fire,
+                "Controller settings": lambda: [self._settings_menu.deactivate(), self.controller_menu.activate()],
+            })
+        return self._settings_menu
+
+    @property
+    def controller_menu(self):
+        if self._controller_menu is None:
+            self._controller_menu = Menu(
+                controllers=self.controllers,
+                title="Controller Settings",
+                options=["Shoot", "Switch bullet", "Switch droppable", "Drop"],
+                parent_menu=self.settings_menu
+            )
+        return self._controller_menu
 
-        # Game over menu
-        self.game_over_background = Entity(model='quad', 
-                                  scale=(self.settings.horizontal_game_area + 1, self.settings.vertical_game_area + 1), 
-                                  color=color.black66,
-                                  transparent=True,
-                                  z=-0.1,
-                                  render_queue=3,
-                                  visible=False)
-        self.game_over_menu = Menu(
+    @property
+    def pause_menu(self):
+        if self._pause_menu is None:
+            self.pause_background = Entity(model='quad', 
+                                      scale=(self.settings.horizontal_game_area + 1, self.settings.vertical_game_area + 1), 
+                                      color=color.black66,
+                                      transparent=True,
+                                      z=-0.1,
+                                      render_queue=3,
+                                      visible=False)
+            self._pause_menu = Menu(
             controllers=self.controllers,
-            title="Game Over",
-            options=["Restart level", "Return to main menu"],
-        )
-        self.game_over_menu.title_text.color = color.red
+            title="Game paused",
+            options=["Continue", "Restart level", "Settings", "Return to main menu"],
+            )
+                
+            self._pause_menu.action_map.update({
+                "Continue": lambda: self.game.toggle_pause(),
+                "Restart level": lambda: [self.game.toggle_pause(), self.game.restart_level()],
+                "Return to main menu": lambda: [self.hide_pause_menu(), self.game.toggle_pause(), self.game.total_cleanup(), self.show_main_menu()],
+            })
+        return self._pause_menu
 
-        self.game_over_menu.action_map.update({
-            "Restart level": lambda: [self.hide_game_over_menu(), self.game.restart_level()],
-            "Return to main menu": lambda: [self.hide_game_over_menu(), self.game.total_cleanup(), self.show_main_menu()],
-        })
+    @property
+    def game_over_menu(self):
+        if self._game_over_menu is None:
+            self.game_over_background = Entity(model='quad', 
+                                      scale=(self.settings.horizontal_game_area + 1, self.settings.vertical_game_area + 1), 
+                                      color=color.black66,
+                                      transparent=True,
+                                      z=-0.1,
+                                      render_queue=3,
+                                      visible=False)
+            self._game_over_menu = Menu(
+                controllers=self.controllers,
+                title="Game Over",
+                options=["Restart level", "Return to main menu"],
+            )
+            self._game_over_menu.title_text.color = color.red
+
+            self._game_over_menu.action_map.update({
+                "Restart level": lambda: [self.hide_game_over_menu(), self.game.restart_level()],
+                "Return to main menu": lambda: [self.hide_game_over_menu(), self.game.total_cleanup(), self.show_main_menu()],
+            })
+        return self._game_over_menu
 
     def show_main_menu(self):
         self.main_menu.activate()
@@ -225,6 +257,8 @@ class StartMenu:
         self.pause_background.visible = True
 
     def hide_pause_menu(self):
+        if self._pause_menu is None:
+            return
         self.pause_menu.deactivate()
         self.pause_background.visible = False
 
@@ -234,6 +268,8 @@ class StartMenu:
         self.game.over = True
 
     def hide_game_over_menu(self):
+        if self._game_over_menu is None:
+            return
         self.game_over_menu.deactivate()
         self.game_over_background.visible = False
         self.game.over = False
@@ -244,6 +280,13 @@ class StartMenu:
         players, level = SaveManager().load_game_from_file(self.game, file_path, self.controllers)
         self.continue_game_callback(os.path.basename(file_path), players, level)
 
+    def _toggle_friendly_fire(self):
+        self.settings.friendly_fire = not self.settings.friendly_fire
+        self.game.collision_matrix.set_friendly_fire(self.settings.friendly_fire)
+        option_index = self.settings_menu.options.index("Enable friendly fire")
+        self.settings_menu.text_elements[option_index].text = "Disable friendly fire" if self.settings.friendly_fire else "Enable friendly fire"
+        print(f"Friendly fire: {self.settings.friendly_fire}")
+
     def _exit(self):
         exit()
 
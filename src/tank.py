@@ -1,11 +1,12 @@
 from ursina import *
 from src.widgetry.healthbar import HealthBar
-from src.enums import CollisionEffect, EntityType, DropEffect
+from src.enums import CollisionEffect, EntityType, DropEffect, Interaction
 from src.misc.timer import Timer
 from src.ammunition import AmmoCatalog
 from src.widgetry.drops import randomize_drop
 from src.widgetry.effects import WetEffect, FireEffect, AimEffect
 from src.misc.spranimator import SpriteAnimator
+from src.misc.audiopool import audio_voices, NULL_VOICE, PRIORITY_HIGH
 from src.misc.utils import vectors_are_equal
 
 
@@ -34,10 +35,11 @@ class Tank(Entity):
         self.fire_effect = FireEffect(self)
         self.aim_effect = AimEffect(self, position=(0, 1))
         self.ammunition = AmmoCatalog(self)
+        self.game.register_entity(self)
 
-        self.boss_audio = Audio('assets/audio/boss.ogg', loop=True, volume=0.5, autoplay=False)
+        self.boss_audio = NULL_VOICE
         if self.entity_type == EntityType.BOSS:
-            self.boss_audio.play()
+            self.boss_audio = audio_voices.pool('assets/audio/boss.ogg', max_voices=1).play(PRIORITY_HIGH, volume=0.5, loop=True)
 
     @property
     def total_damage_dealt(self):
@@ -116,8 +118,9 @@ class Tank(Entity):
     def respawn(self):
         raise Exception("We implement respawn method of Tank entity in derived classes")
 
-    def move(self, direction_vector):
-        """Move the enemy tank in the specified direction if no collision is detected."""
+    def move(self, direction_vector, dt, max_distance=None):
+        """Move the enemy tank in the specified direction by one simulation tick if no collision is detected.
+        max_distance shortens the step, so the tank can stop exactly at a point."""
         if self.is_exploded:
             return
         # if self.entity_type == EntityType.PLAYER_TANK:
@@ -126,57 +129,37 @@ class Tank(Entity):
         
         movement_is_allowed = True
         #collided_entity = self.game.get_collided_entity(self, direction_vector, movement_distance)
-        next_position = self.position + direction_vector * (time.dt * self.speed)
-        collided_entities = self.game.get_collided_entities_at_position(self, next_position)
-        if len(collided_entities) == 0:
-            #self.affected_speed = 0
-            movement_is_allowed = True
+        step = dt * self.speed if max_distance is None else min(dt * self.speed, max_distance)
+        next_position = self.position + direction_vector * step
+        half_extents = self.get_half_extents(direction_vector)
+        terrain_grid = self.game.terrain_grid
+        collision_matrix = self.game.collision_matrix
+        if terrain_grid.is_blocked(next_position.x, next_position.y, *half_extents):
+            # Static barriers are resolved by the terrain grid, a tank pushing against one still picks up
+            # the drops and triggers the landmines it reaches
+            movement_is_allowed = False
+            collided_entities = [e for e in self.game.get_collided_entities_at_position(self, next_position)
+                                 if collision_matrix.movement(self.entity_type, e.entity_type) in (Interaction.PICKUP, Interaction.DAMAGE)]
         else:
-            for collided_entity in collided_entities:
-                if collided_entity.entity_type == EntityType.TERRAIN:
-                    if hasattr(collided_entity, 'collision_effect'):
-                        if collided_entity.collision_effect == CollisionEffect.BARRIER:
-                            movement_is_allowed = False
-                            break
-                        if collided_entity.collision_effect == CollisionEffect.SLOW_DOWN:
-                            if not self.wet_damage_timer.is_on:
-                                self.slow_down_timer.start(collided_entity.effect_strength)
-                        elif collided_entity.collision_effect == CollisionEffect.DAMAGE_BURN:
-                            self.burn_damage_timer.start(collided_entity.effect_strength)
-                        elif collided_entity.collision_effect == CollisionEffect.DAMAGE_WET:
-                            self.wet_damage_timer.start(collided_entity.effect_strength)
-                elif collided_entity.entity_type == EntityType.SUPPLY_DROP:
-                    if collided_entity.drop_effect == DropEffect.MISSILE_DAMAGE_INCREASE:
-                        self.ammunition.bullet_pool.hit_damage += 1
-                    if collided_entity.drop_effect == DropEffect.MISSILE_RATE_INCREASE:
-                        self.ammunition.bullet_pool.max_bullets += 1
-                    if collided_entity.drop_effect == DropEffect.MISSILE_SPEED_INCREASE:
-                        self.ammunition.bullet_pool.bullet_speed += 1
-                    if collided_entity.drop_effect == DropEffect.LANDMINE_PICK:
-                        self.ammunition.add_landmine()
-                        self.ammunition.add_landmine()
-                        self.ammunition.add_landmine()
-                    if collided_entity.drop_effect == DropEffect.BUILDING_BLOCK_PICK:
-                        self.ammunition.add_block()
-                        self.ammunition.add_block()
-                    destroy(collided_entity)
-                    destroy(collided_entity)
-                elif (collided_entity.entity_type == EntityType.ENEMY_TANK 
-                      or collided_entity.entity_type == EntityType.PLAYER_TANK or 
-                      collided_entity.entity_type == EntityType.BOSS):
-                    if collided_entity.collision_effect == CollisionEffect.BARRIER:
-                        movement_is_allowed = False
-                        break
-                if collided_entity.entity_type == EntityType.LANDMINE:
-                    if collided_entity.collision_effect == CollisionEffect.DAMAGE_EXPLOSION:
-                        damage_amount = min(self.durability, collided_entity.effect_strength)
-                        collided_entity.owner.tanks_damage_dealt += damage_amount
-                        self.durability -= collided_entity.effect_strength
-                        self.check_destroy()
-                        collided_entity.explode()
+            # Water, fire, sand and alike have no colliders, their effects are sampled under the tank footprint
+            for collision_effect, effect_strength in terrain_grid.sample_effects(next_position.x, next_position.y, *half_extents).items():
+                self.apply_ground_effect(collision_effect, effect_strength)
+            collided_entities = self.game.get_collided_entities_at_position(self, next_position)
+        for collided_entity in collided_entities:
+            interaction = collision_matrix.movement(self.entity_type, collided_entity.entity_type)
+            if interaction == Interaction.BLOCK:
+                if collided_entity.collision_effect == CollisionEffect.BARRIER:
+                    movement_is_allowed = False
+                    break
+            elif interaction == Interaction.TRIGGER:
+                self.apply_ground_effect(collided_entity.collision_effect, collided_entity.effect_strength)
+            elif interaction == Interaction.PICKUP:
+                self.pick_up(collided_entity)
+            elif interaction == Interaction.DAMAGE:
+                self.step_on(collided_entity)
         
         if movement_is_allowed:
-            next_position = self.position + direction_vector * (time.dt * self.speed)
+            next_position = self.position + direction_vector * step
             self.__move(next_position)
 
         if vectors_are_equal(direction_vector, Vec3(0, 1, 0)):
@@ -188,83 +171,92 @@ class Tank(Entity):
         if vectors_are_equal(direction_vector, Vec3(-1, 0, 0)):
             self.rotation_z = -90
 
-    @staticmethod
-    def get_collision_element(element, direction, distance):
-        """Gets the entity that was collided with passed entity"""
-        try:
-            ray = raycast(element.position, direction, ignore=[element], distance=distance)
-            if ray.hit:
-                return ray
-        except Exception as ex:
-            pass
-        return None
+    def apply_ground_effect(self, collision_effect, effect_strength):
+        if collision_effect == CollisionEffect.SLOW_DOWN:
+            if not self.wet_damage_timer.is_on:
+                self.slow_down_timer.start(effect_strength)
+        elif collision_effect == CollisionEffect.DAMAGE_BURN:
+            self.burn_damage_timer.start(effect_strength)
+        elif collision_effect == CollisionEffect.DAMAGE_WET:
+            self.wet_damage_timer.start(effect_strength)
 
-    def move_bullet(self, dt):
-        active_bullets = [] # List of (bullet, pool) tuples
-        for pool in self.ammunition.bullet_pools:
-            for bullet in pool.active_bullets:
-                active_bullets.append((bullet, pool))
-        for bullet, pool in active_bullets:
-            ray = self.get_collision_element(bullet, bullet.velocity, 1)
-            bullet.position += bullet.velocity * dt
-            collided_entities, collision_point = [], (0, 0)
-            if ray is not None:
-                collided_entities, collision_point = ray.entities, ray.point
-            # Find the first collided entity that takes hit
-            collided_entity = None
-            for entity in collided_entities:
-                if hasattr(entity, 'takes_hit'):
-                    collided_entity = entity
-            # Destroy bullet if it goes off-screen
-            if collided_entity == None and not self.game.is_on_screen(bullet):
-                pool.release_bullet(bullet)
-                return
-            
-            if bullet.visible and collided_entity != None:
-                # This if and break affect the performance - consider fixing it
-                if (collided_entity.entity_type == self.ammunition.owner.entity_type 
-                    or collided_entity.entity_type == EntityType.BOSS and self.ammunition.owner.entity_type == EntityType.ENEMY_TANK
-                    or collided_entity.entity_type == EntityType.ENEMY_TANK and self.entity_type == EntityType.BOSS):
-                    break
-                if collided_entity.takes_hit:
-                    collided_entity.durability -= bullet.hit_damage
-                    if collided_entity.durability <= 0:
-                        if hasattr(collided_entity, 'is_tank'):
-                                if not collided_entity.is_exploded:
-                                    self.kills += 1
-                                    collided_entity.check_destroy()
-                        else:
-                            destroy(collided_entity)
-                            if collided_entity.entity_type == EntityType.BASE:
-                                self.game.show_game_over()
-                    if hasattr(collided_entity, 'is_tank') and not collided_entity.is_exploded:
-                        self.tanks_damage_dealt += pool.hit_damage
-                    else:
-                        self.other_damage_dealt += pool.hit_damage
-                        
-                    self.ammunition.bullet_pool.release_bullet(bullet)
+    def pick_up(self, drop):
+        if drop.drop_effect == DropEffect.MISSILE_DAMAGE_INCREASE:
+            self.ammunition.bullet_pool.hit_damage += 1
+        if drop.drop_effect == DropEffect.MISSILE_RATE_INCREASE:
+            self.ammunition.bullet_pool.max_bullets += 1
+        if drop.drop_effect == DropEffect.MISSILE_SPEED_INCREASE:
+            self.ammunition.bullet_pool.bullet_speed += 1
+        if drop.drop_effect == DropEffect.LANDMINE_PICK:
+            self.ammunition.add_landmine()
+            self.ammunition.add_landmine()
+            self.ammunition.add_landmine()
+        if drop.drop_effect == DropEffect.BUILDING_BLOCK_PICK:
+            self.ammunition.add_block()
+            self.ammunition.add_block()
+        destroy(drop)
+
+    def step_on(self, landmine):
+        if landmine.collision_effect == CollisionEffect.DAMAGE_EXPLOSION:
+            damage_amount = min(self.durability, landmine.effect_strength)
+            landmine.owner.tanks_damage_dealt += damage_amount
+            self.durability -= landmine.effect_strength
+            self.check_destroy()
+            landmine.explode()
+
+    def get_half_extents(self, direction_vector):
+        """Half width and height of the tank box when it faces the given direction"""
+        half_width, half_height = abs(self.scale_x) / 2, abs(self.scale_y) / 2
+        if abs(direction_vector.x) > abs(direction_vector.y):
+            # Facing left or right rotates the tank by 90 degrees
+            return half_height, half_width
+        return half_width, half_height
+
+    def is_friendly(self, entity):
+        """True if the bullets of this tank fly through the entity"""
+        return self.game.collision_matrix.projectile(self.entity_type, entity.entity_type) != Interaction.DAMAGE
+
+    def on_bullet_hit(self, collided_entity, hit_damage, pool):
+        """Applies the damage of a bullet shot by this tank"""
+        collided_entity.durability -= hit_damage
+        if collided_entity.durability <= 0:
+            if hasattr(collided_entity, 'is_tank'):
+                    if not collided_entity.is_exploded:
+                        self.kills += 1
+                        collided_entity.check_destroy()
+            else:
+                destroy(collided_entity)
+                if collided_entity.entity_type == EntityType.BASE:
+                    self.game.show_game_over()
+        if hasattr(collided_entity, 'is_tank') and not collided_entity.is_exploded:
+            self.tanks_damage_dealt += pool.hit_damage
+        else:
+            self.other_damage_dealt += pool.hit_damage
 
-    def update(self):
-        self.move_bullet(time.dt)
+    def tick(self, dt):
+        """One fixed simulation step, called by the game for every registered tank"""
         if self.game.over:
             return
         
-        self.burn_damage_timer.update()
-        self.wet_damage_timer.update()
-        self.slow_down_timer.update()
+        self.burn_damage_timer.update(dt)
+        self.wet_damage_timer.update(dt)
+        self.slow_down_timer.update(dt)
 
         if self.is_exploded:
-            self.explosion_animation.update()
+            self.explosion_animation.update(dt)
             if self.entity_type == EntityType.BOSS:
                 self.boss_audio.stop()                
                 
     def __move(self, next_position):
         if self.game.is_position_on_screen(next_position):
             self.position = next_position
+            self.game.update_entity_position(self)
 
     def destroy(self):
+        self.game.unregister_entity(self)
         self.ammunition.destroy()
-        destroy(self.boss_audio)
+        self.explosion_animation.release()
+        self.boss_audio.stop()
 
         print(f'{self} destroyed')
         destroy(self)
@@ -0,0 +1,163 @@
+import math
+from ursina import Entity, Mesh, destroy
+from src.registry import TERRAIN_TYPES
+
+CHUNK_TILES = 8  # Chunk side in tiles
+
+
+class TerrainBatch(Entity):
+    """
+    Draws the static terrain as one mesh per chunk of CHUNK_TILES x CHUNK_TILES tiles and texture instead of a quad
+    per tile. The tile entities stay for the gameplay (durability, terrain grid, collisions), parented under a
+    hidden node so the renderer skips them. Adding, moving or removing a tile only rebuilds the meshes of its
+    chunk, at the next frame or flush().
+    """
+    def __init__(self, game, chunk_tiles=CHUNK_TILES, **kwargs):
+        super().__init__(name='terrain_batch', **kwargs)
+        self.game = game
+        self.chunk_size = chunk_tiles * game.tile_size
+        self.tiles_root = Entity(name='batched_tiles', visible=False)
+        self.groups = {}       # (chunk x, chunk y, texture key) -> {id(tile): tile}
+        self.textures = {}     # texture key -> Texture, only while a group uses it so evicted tilesets can be freed
+        self.texture_groups = {}  # texture key -> number of groups
+        self.meshes = {}       # group key -> chunk Entity
+        self.tile_groups = {}  # id(tile) -> group key
+        self.dirty = set()
+        self.rebuilds = 0
+
+    @staticmethod
+    def batchable(entity):
+        return entity.entity_type in TERRAIN_TYPES and entity.texture is not None and not entity.children
+
+    def _group_key(self, tile):
+        texture = tile.texture
+        texture_key = str(texture.path) if texture.path else id(texture)
+        self.textures[texture_key] = texture
+        return (math.floor(tile.x / self.chunk_size), math.floor(tile.y / self.chunk_size), texture_key)
+
+    def add(self, tile):
+        key = self._group_key(tile)
+        if key not in self.groups:
+            self.groups[key] = {}
+            self.texture_groups[key[2]] = self.texture_groups.get(key[2], 0) + 1
+        self.groups[key][id(tile)] = tile
+        self.tile_groups[id(tile)] = key
+        tile.parent = self.tiles_root
+        self.dirty.add(key)
+
+    def remove(self, tile):
+        key = self.tile_groups.pop(id(tile), None)
+        if key is None:
+            return
+        tiles = self.groups[key]
+        tiles.pop(id(tile), None)
+        if tiles:
+            self.dirty.add(key)
+            return
+        # The last tile of the group, its mesh goes at once and the texture with the last group using it
+        del self.groups[key]
+        self.dirty.discard(key)
+        mesh = self.meshes.pop(key, None)
+        if mesh is not None:
+            destroy(mesh)
+        self.texture_groups[key[2]] -= 1
+        if not self.texture_groups[key[2]]:
+            del self.texture_groups[key[2]]
+            del self.textures[key[2]]
+
+    def move(self, tile):
+        """Must be called after a batched tile changed its position"""
+        if id(tile) in self.tile_groups:
+            self.remove(tile)
+            self.add(tile)
+
+    def _rebuild(self, key):
+        old = self.meshes.pop(key, None)
+        if old is not None:
+            destroy(old)
+        tiles = self.groups.get(key)
+        if not tiles:
+            return
+        vertices, triangles, uvs = [], [], []
+        for tile in tiles.values():
+            half_x, half_y = abs(tile.scale_x) / 2, abs(tile.scale_y) / 2
+            x, y, z = tile.x, tile.y, tile.z
+            first = len(vertices)
+            vertices += [(x - half_x, y - half_y, z), (x + half_x, y - half_y, z),
+                         (x + half_x, y + half_y, z), (x - half_x, y + half_y, z)]
+            # Tiles from an atlas page show their region of it
+            (offset_u, offset_v), (scale_u, scale_v) = tile.texture_offset, tile.texture_scale
+            uvs += [(offset_u, offset_v), (offset_u + scale_u, offset_v),
+                    (offset_u + scale_u, offset_v + scale_v), (offset_u, offset_v + scale_v)]
+            triangles += [(first, first + 1, first + 2), (first, first + 2, first + 3)]
+        self.meshes[key] = Entity(name=f'terrain_chunk_{key[0]}_{key[1]}', model=Mesh(vertices=vertices, triangles=triangles, uvs=uvs),
+                                  texture=self.textures[key[2]], render_queue=1)
+        self.rebuilds += 1
+
+    def flush(self):
+        if self.game.headless:
+            self.dirty.clear()  # Nothing is rendered
+            return
+        for key in self.dirty:
+            self._rebuild(key)
+        self.dirty.clear()
+
+    def update(self):
+        if self.dirty:
+            self.flush()
+
+
+if __name__ == '__main__':
+    # Rendered scene nodes, draw calls (visible Geoms) and the frame time of every shipped level, a quad per tile against the chunks
+    import glob
+    import time as pytime
+    from types import SimpleNamespace
+    from panda3d.core import loadPrcFileData
+    loadPrcFileData('', 'audio-library-name null')
+    from ursina import Ursina, scene, camera
+    app = Ursina(window_type='offscreen', development_mode=False)
+    camera.orthographic = True
+    camera.fov = 14
+    from src.tileloader import TileLoader
+
+    def visible_nodes():
+        return sum(1 for path in scene.findAllMatches('**') if not path.isHidden())
+
+    def visible_geoms():
+        return sum(path.node().getNumGeoms() for path in scene.findAllMatches('**/+GeomNode') if not path.isHidden())
+
+    def frame_time(frames=60):
+        app.step()
+        start = pytime.perf_counter()
+        for _ in range(frames):
+            app.step()
+        return (pytime.perf_counter() - start) / frames * 1000
+
+    class Game(SimpleNamespace):
+        def add_terrain_entity(self, tile):
+            self.tiles.append(tile)
+
+    for tmx_file in sorted(glob.glob('assets/levels/level*.tmx')):
+        game = Game(tile_size=1, headless=False, tiles=[])
+        TileLoader(game, 1).load(tmx_file)
+        per_tile = (visible_nodes(), visible_geoms(), frame_time())
+        batch = TerrainBatch(game)
+        for tile in game.tiles:
+            batch.add(tile)
+        batch.flush()
+        batched = (visible_nodes(), visible_geoms(), frame_time())
+        # One destroyed wall only rebuilds its chunk
+        rebuilds = batch.rebuilds
+        start = pytime.perf_counter()
+        batch.remove(game.tiles[len(game.tiles) // 2])
+        batch.flush()
+        rebuild_time = (pytime.perf_counter() - start) * 1000
+        print(f"{tmx_file}: {len(game.tiles)} tiles, nodes {per_tile[0]} -> {batched[0]}, draw calls {per_tile[1]} -> {batched[1]}, "
+              f"frame {per_tile[2]:.2f} -> {batched[2]:.2f} ms, one tile removed: {batch.rebuilds - rebuilds} mesh rebuilt "
+              f"in {rebuild_time:.2f} ms")
+        for tile in game.tiles:
+            destroy(tile)
+        for mesh in batch.meshes.values():
+            destroy(mesh)
+        destroy(batch.tiles_root)
+        destroy(batch)
@@ -0,0 +1,132 @@
+import math
+import numpy as np
+from src.enums import CollisionEffect, EntityType
+
+# Cell flags, several of them can be combined in one cell (e.g. a building block placed on grass)
+BARRIER = 1 << 0
+SLOW_DOWN = 1 << 1
+BURN = 1 << 2
+WET = 1 << 3
+BASE = 1 << 4
+TAKES_HIT = 1 << 5
+
+# Boxes that only touch a tile edge must not count as overlapping it
+EDGE_TOLERANCE = 1e-4
+
+EFFECT_FLAGS = {
+    CollisionEffect.BARRIER: BARRIER,
+    CollisionEffect.SLOW_DOWN: SLOW_DOWN,
+    CollisionEffect.DAMAGE_BURN: BURN,
+    CollisionEffect.DAMAGE_WET: WET,
+}
+
+
+class TerrainGrid:
+    """
+    Occupancy and effect grid of the static terrain. Row 0 is the top row of the map, column 0 the leftmost one.
+    The arrays are kept in sync with the terrain entities, so barrier checks are plain array lookups.
+    """
+    def __init__(self, width, height, tile_size):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.left = -width / 2 * tile_size
+        self.top = height / 2 * tile_size
+        self.flags = np.zeros((height, width), dtype=np.uint8)
+        self.effects = np.full((height, width), CollisionEffect.NO_EFFECT.value, dtype=np.int8)
+        self.strengths = np.zeros((height, width), dtype=np.float32)
+        self.tiles = [[[] for _ in range(width)] for _ in range(height)]
+        self._entity_cells = {}  # id(entity) -> (row, col)
+        self.version = 0  # Increased on every change, lets the users cache data derived from the grid
+
+    def world_to_cell(self, x, y):
+        return (math.floor((self.top - y) / self.tile_size),
+                math.floor((x - self.left) / self.tile_size))
+
+    def cell_to_world(self, row, col):
+        return (self.left + (col + 0.5) * self.tile_size,
+                self.top - (row + 0.5) * self.tile_size)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.height and 0 <= col < self.width
+
+    def box_slices(self, x, y, half_width, half_height):
+        """Row and column slices of the cells overlapped by the box, clipped to the grid"""
+        tile_size = self.tile_size
+        half_width -= EDGE_TOLERANCE
+        half_height -= EDGE_TOLERANCE
+        col_min = math.floor((x - half_width - self.left) / tile_size)
+        col_max = math.ceil((x + half_width - self.left) / tile_size)
+        row_min = math.floor((self.top - y - half_height) / tile_size)
+        row_max = math.ceil((self.top - y + half_height) / tile_size)
+        return (slice(max(0, row_min), min(self.height, row_max)),
+                slice(max(0, col_min), min(self.width, col_max)))
+
+    def is_blocked(self, x, y, half_width, half_height):
+        rows, cols = self.box_slices(x, y, half_width, half_height)
+        return bool((self.flags[rows, cols] & BARRIER).any())
+
+    def sample_effects(self, x, y, half_width, half_height):
+        """Ground effects under the box as {CollisionEffect: strongest effect strength}"""
+        rows, cols = self.box_slices(x, y, half_width, half_height)
+        effects = self.effects[rows, cols]
+        found = {}
+        if not effects.any():
+            return found
+        strengths = self.strengths[rows, cols]
+        for value in np.unique(effects):
+            if value != CollisionEffect.NO_EFFECT.value:
+                found[CollisionEffect(int(value))] = float(strengths[effects == value].max())
+        return found
+
+    def tiles_in_box(self, x, y, half_width, half_height):
+        rows, cols = self.box_slices(x, y, half_width, half_height)
+        found = []
+        for row in range(rows.start, rows.stop):
+            for col in range(cols.start, cols.stop):
+                found.extend(self.tiles[row][col])
+        return found
+
+    def add_tile(self, entity):
+        """Files the tile under the cell of its position, a tile moved off the grid leaves its old cell"""
+        self.remove_tile(entity)
+        row, col = self.world_to_cell(entity.x, entity.y)
+        if not self.in_bounds(row, col):
+            return
+        self.tiles[row][col].append(entity)
+        self._entity_cells[id(entity)] = (row, col)
+        self._refresh_cell(row, col)
+
+    def remove_tile(self, entity):
+        cell = self._entity_cells.pop(id(entity), None)
+        if cell is None:
+            return
+        row, col = cell
+        tiles = self.tiles[row][col]
+        for i, tile in enumerate(tiles):
+            if tile is entity:
+                del tiles[i]
+                break
+        self._refresh_cell(row, col)
+
+    def _refresh_cell(self, row, col):
+        flags = 0
+        effect = CollisionEffect.NO_EFFECT
+        strength = 0
+        for tile in self.tiles[row][col]:
+            collision_effect = getattr(tile, 'collision_effect', None)
+            flags |= EFFECT_FLAGS.get(collision_effect, 0)
+            if getattr(tile, 'entity_type', None) == EntityType.BASE:
+                flags |= BASE
+            if getattr(tile, 'takes_hit', False):
+                flags |= TAKES_HIT
+            if collision_effect in EFFECT_FLAGS and collision_effect != CollisionEffect.BARRIER:
+                # The strongest ground effect of the cell wins
+                tile_strength = getattr(tile, 'effect_strength', 0) or 0
+                if effect == CollisionEffect.NO_EFFECT or tile_strength > strength:
+                    effect = collision_effect
+                    strength = tile_strength
+        self.flags[row, col] = flags
+        self.effects[row, col] = effect.value
+        self.strengths[row, col] = strength
+        self.version += 1
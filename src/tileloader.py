@@ -1,8 +1,13 @@
 from ursina import *
-import pytmx
 from src.enums import *
 import os
+from types import SimpleNamespace
 from src.widgetry.drops import randomize_drop
+from src.terraingrid import TerrainGrid
+from src.misc.texturecache import texture_cache
+from src.misc.spranimator import sprite_clips
+from src.misc.atlas import texture_atlas, show_region
+from src.levelcache import load_level
 
 class TileLoader:
     def __init__(self, game, tile_size):
@@ -16,50 +21,90 @@ class TileLoader:
         except Exception as ex:
             return None
         
-    def load(self, tmx_file,):
+    @staticmethod
+    def load_terrain_grid(tmx_file, tile_size):
+        """TerrainGrid of the map without creating any entities, for the tools and the benchmarks"""
+        level = load_level(tmx_file)
+        grid = TerrainGrid(level.width, level.height, tile_size)
+        for x, y, _, tile_props in level.placed_tiles():
+            grid.add_tile(SimpleNamespace(
+                x=0.5 + (x - level.width / 2) * tile_size,
+                y=-0.5 - (y - level.height / 2) * tile_size,
+                entity_type=TileLoader.get_tile_prop(tile_props, "entity_type", EntityType),
+                collision_effect=TileLoader.get_tile_prop(tile_props, "collision_effect", CollisionEffect),
+                effect_strength=tile_props.get("effect_strength"),
+                takes_hit=tile_props.get("takes_hit")))
+        return grid
+
+    def create_tile(self, x, y, tile_texture, tile_props, map_width, map_height, **kwargs):
+        """Tile entity of the map cell x, y. It isn't registered in the game yet"""
         game = self.game
         tile_size = self.tile_size
-        self.tmx_data = pytmx.TiledMap(tmx_file)
-        map_width = self.tmx_data.width
-        map_height = self.tmx_data.height
+        world_x = 0.5 + (x - map_width / 2) * tile_size
+        world_y = -0.5 - (y - map_height / 2) * tile_size
+        name = os.path.splitext(os.path.basename(tile_texture))[0]
+        name = f"{name}_{x}_{y}"
+        durability = tile_props.get("durability")
+        takes_hit = tile_props.get("takes_hit")
+        damaging = tile_props.get("damaging")
+        collision_effect = self.get_tile_prop(tile_props, "collision_effect", CollisionEffect)
+        entity_type=self.get_tile_prop(tile_props, "entity_type", EntityType)
+        
+        effect_strength = tile_props.get("effect_strength")
+        region = texture_atlas.region(tile_texture)
+        # Every tile that shares the atlas page lands in one chunk mesh of the terrain batch
+        texture_source = (region.page, region.filtering) if region is not None else (tile_texture, 'mipmap')
+        tile = Entity(
+            name=name,
+            model='quad',
+            entity_type=entity_type,
+            z = 0.001,
+            texture=texture_cache.acquire(*texture_source),
+            texture_source=texture_source,  # Released to the cache when the tile is removed
+            scale=(game.tile_size - 0.001, game.tile_size - 0.001),
+            position=(world_x, world_y),
+            # Only barriers need a collider, the ground effects come from the terrain grid
+            collider='box' if collision_effect == CollisionEffect.BARRIER else None,
+            durability=durability,
+            takes_hit=takes_hit,
+            damaging=damaging,
+            collision_effect=collision_effect,
+            effect_strength=effect_strength,
+            render_queue=1,
+            color = color.Color(1,1,1,1),
+            **kwargs
+        )
+        if region is not None:
+            show_region(tile, region)
+        return tile
 
-        for layer in self.tmx_data.visible_layers:
-            if isinstance(layer, pytmx.TiledTileLayer):
-                for x, y, gid in layer:
-                    tile_props = self.tmx_data.get_tile_properties_by_gid(gid) or {}
-                    tile_texture = self.tmx_data.get_tile_image_by_gid(gid)
+    def load(self, tmx_file,):
+        game = self.game
+        # The compiled map is memory-mapped, the .tmx is only parsed again when it or a tileset changed
+        level = load_level(tmx_file)
+        game.terrain_grid = TerrainGrid(level.width, level.height, self.tile_size)
+
+        for x, y, tile_texture, tile_props in level.placed_tiles():
+            game.add_terrain_entity(self.create_tile(x, y, tile_texture, tile_props, level.width, level.height))
 
-                    if tile_texture:
-                        tile_texture, *_ = tile_texture
-                        world_x = 0.5 + (x - map_width / 2) * tile_size
-                        world_y = -0.5 - (y - map_height / 2) * tile_size
-                        name = os.path.splitext(os.path.basename(tile_texture))[0]
-                        name = f"{name}_{x}_{y}"
-                        durability = tile_props.get("durability")
-                        takes_hit = tile_props.get("takes_hit")
-                        damaging = tile_props.get("damaging")
-                        collision_effect = self.get_tile_prop(tile_props, "collision_effect", CollisionEffect)
-                        entity_type=self.get_tile_prop(tile_props, "entity_type", EntityType)
-                        
-                        effect_strength = tile_props.get("effect_strength")
-                        tile = Entity(
-                            name=name,
-                            model='quad',
-                            entity_type=entity_type,
-                            z = 0.001,
-                            texture=Texture(tile_texture, 'mipmap'),      
-                            scale=(game.tile_size - 0.001, game.tile_size - 0.001),
-                            position=(world_x, world_y),
-                            collider='box',
-                            durability=durability,
-                            takes_hit=takes_hit,
-                            damaging=damaging,
-                            collision_effect=collision_effect,
-                            effect_strength=effect_strength,
-                            render_queue=1,
-                            color = color.Color(1,1,1,1)
-                        )
+        # The tiles of the previous level are gone by now, the images this level doesn't share are unloaded
+        sprite_clips.evict_unused()  # Before the textures, it hands its frames back to the cache
+        texture_cache.evict_unused()
 
-                        tile.on_destroy = lambda t=tile: game.remove_terrain_entity(t)
-                        game.terrain_entities.append(tile)
 
+if __name__ == '__main__':
+    # Collidable tiles per shipped level: every tile had a collider before, now only the barriers have one
+    import glob
+    import pytmx
+    for tmx_file in sorted(glob.glob('assets/levels/level*.tmx')):
+        tmx_data = pytmx.TiledMap(tmx_file)
+        tiles = barriers = 0
+        for layer in tmx_data.visible_layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                for x, y, gid in layer:
+                    if tmx_data.get_tile_image_by_gid(gid):
+                        tiles += 1
+                        tile_props = tmx_data.get_tile_properties_by_gid(gid) or {}
+                        if TileLoader.get_tile_prop(tile_props, "collision_effect", CollisionEffect) == CollisionEffect.BARRIER:
+                            barriers += 1
+        print(f"{os.path.basename(tmx_file)}: {tiles} -> {barriers} collidable tiles ({100 - barriers * 100 // tiles}% less)")
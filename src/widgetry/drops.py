@@ -1,6 +1,7 @@
 from ursina import *
 from src.enums import EntityType, DropEffect
 from src.widgetry.effects import Outline
+from src.misc.atlas import use_atlas_image
 from src.misc.timer import Timer
 import random
 
@@ -16,8 +17,8 @@ class SupplyDrop(Entity):
         self.destroy_timer = Timer(7, 1, lambda _: None, self.self_destroy)
         self.destroy_timer.start()
 
-    def update(self):
-        self.destroy_timer.update()
+    def tick(self, dt):
+        self.destroy_timer.update(dt)
 
 
     def self_destroy(self):
@@ -25,27 +26,32 @@ class SupplyDrop(Entity):
 
 class GunDrop(SupplyDrop):
     def __init__(self, **kwargs):
-        super().__init__(color=color.white66, texture="assets/images/gun.png", drop_effect=DropEffect.MISSILE_DAMAGE_INCREASE, **kwargs)
+        super().__init__(color=color.white66, drop_effect=DropEffect.MISSILE_DAMAGE_INCREASE, **kwargs)
+        use_atlas_image(self, "assets/images/gun.png")
         outline=Outline(parent_entity=self, scale=(1.1, 1.1))
 
 class FastBulletDrop(SupplyDrop):
     def __init__(self, **kwargs):
-        super().__init__(color=color.white66, texture="assets/images/fast_bullet.png", drop_effect=DropEffect.MISSILE_SPEED_INCREASE, **kwargs)
+        super().__init__(color=color.white66, drop_effect=DropEffect.MISSILE_SPEED_INCREASE, **kwargs)
+        use_atlas_image(self, "assets/images/fast_bullet.png")
         outline=Outline(parent_entity=self, scale=(1.1, 1.1))
 
 class MachineGunDrop(SupplyDrop):
     def __init__(self, **kwargs):
-        super().__init__(color=color.white66, texture="assets/images/machine_gun.png", drop_effect=DropEffect.MISSILE_RATE_INCREASE, **kwargs)
+        super().__init__(color=color.white66, drop_effect=DropEffect.MISSILE_RATE_INCREASE, **kwargs)
+        use_atlas_image(self, "assets/images/machine_gun.png")
         outline=Outline(parent_entity=self, scale=(1.1, 1.1))
 
 class LandmineDrop(SupplyDrop):
     def __init__(self, **kwargs):
-        super().__init__(color=color.white66, texture="assets/images/landmine.png", drop_effect=DropEffect.LANDMINE_PICK, **kwargs)
+        super().__init__(color=color.white66, drop_effect=DropEffect.LANDMINE_PICK, **kwargs)
+        use_atlas_image(self, "assets/images/landmine.png")
         outline=Outline(parent_entity=self, scale=(1.1, 1.1))
 
 class BuildingBlockDrop(SupplyDrop):
     def __init__(self, **kwargs):
-        super().__init__(color=color.white66, texture="assets/images/white_wall.png", drop_effect=DropEffect.BUILDING_BLOCK_PICK, **kwargs)
+        super().__init__(color=color.white66, drop_effect=DropEffect.BUILDING_BLOCK_PICK, **kwargs)
+        use_atlas_image(self, "assets/images/white_wall.png")
         outline=Outline(parent_entity=self, scale=(1.1, 1.1))
 
 def randomize_drop(position, game):
@@ -58,6 +64,5 @@ def randomize_drop(position, game):
     ]
     
     entity = random.choice(drop_list)(position=(position.x, position.y, -0.01))
-    entity.on_destroy = lambda e=entity: game.remove_terrain_entity(e)
-    game.terrain_entities.append(entity)
+    game.add_terrain_entity(entity)
     
\ No newline at end of file
@@ -1,36 +1,37 @@
 from ursina import *
+from src.misc.atlas import use_atlas_image
 
 class Outline(Entity):
     def __init__(self, parent_entity, **kwargs):
         super().__init__(
                 parent=parent_entity,
-                texture='assets/images/joystick_outline.png',
                 model='quad',
                 **kwargs            )
+        use_atlas_image(self, "assets/images/joystick_outline.png")
 
 class WetEffect(Entity):
     def __init__(self, parent_entity=None, **kwargs):
         super().__init__(
             parent=parent_entity,
-            texture='assets/images/wet_effect.png',
             model='quad',
             color=color.Color(1, 1, 1, 0.5),
             z=-0.01,
             visible=False,
             **kwargs
         )
+        use_atlas_image(self, "assets/images/wet_effect.png")
 
 class FireEffect(Entity):
     def __init__(self, parent_entity=None, **kwargs):
         super().__init__(
             parent=parent_entity,
-            texture='assets/images/fire_effect.png',
             model='quad',
             color=color.Color(1, 1, 1, 0.5),
             z=-0.01,
             visible=False,
             **kwargs
         )
+        use_atlas_image(self, "assets/images/fire_effect.png")
 
 class BulletEffect(Entity):
     def __init__(self, parent_entity=None, texture="", **kwargs):
@@ -49,10 +50,10 @@ class BulletEffect(Entity):
 class AimEffect(Entity):
     def __init__(self, parent_entity=None, **kwargs):
         super().__init__(parent = parent_entity,
-                         texture="assets/images/aim.png",
                          model="quad",
                          color=color.white,
                          z=-0.1,
                          scale=(0.4, 0.4),
                          visible=False,
-                         **kwargs)
\ No newline at end of file
+                         **kwargs)
+        use_atlas_image(self, "assets/images/aim.png")
\ No newline at end of file